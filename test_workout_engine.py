@@ -0,0 +1,346 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import workout_engine as we
+
+ROWS = [
+    ["01.03.2024 07:30", "Run", "", "", "", "5.00", "5:00", "morning", "1"],
+    ["02.03.2024 18:00", "Walk", "", "", "", "3.20", "11:15", "", "2"],
+    ["03.03.2024 12:00", "Swim", "", "", "", "800", "2:05", "pool", "3"],
+]
+
+class AppendedRowsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backend = we.CsvBackend(self.directory)
+        self.backend.write_workouts(ROWS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append_line(self, row):
+        with open(self.backend.workouts_path, "a", newline="") as file:
+            csv.writer(file).writerow(row)
+
+    def stored_rows(self):
+        with open(self.backend.workouts_path, newline="") as file:
+            return list(csv.reader(file))[1:]
+
+    def test_appended_row_without_id_gets_one(self):
+        store = we.WorkoutStore(self.backend)
+        store.load()
+        self.append_line(["04.03.2024 08:00", "Run", "", "", "", "10.00", "5:30", "long"])
+        rows = list(store.load())
+        self.assertEqual(len(rows), 4)
+        added = [row for row in rows if row[7] == "long"]
+        self.assertEqual(len(added), 1)
+        self.assertTrue(we.is_record_id(added[0][8]))
+        self.assertNotIn(added[0][8], ["1", "2", "3"])
+        # The new id is written back, so the row survives later edits and compaction
+        self.assertIn(added[0], self.stored_rows())
+        store.delete(["2"])
+        store.compact()
+        reloaded = list(we.WorkoutStore(we.CsvBackend(self.directory)).load())
+        self.assertIn(added[0], reloaded)
+        self.assertEqual(len(reloaded), 3)
+
+    def test_appended_row_without_id_is_migrated(self):
+        self.append_line(["04.03.2024 08:00", "Run", "", "", "", "10.00", "5:30", "long"])
+        backend = we.migrate_to_sqlite(self.directory)
+        rows = backend.read_workouts()[1]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual([row[7] for row in rows if row[8] not in ["1", "2", "3"]], ["long"])
+        backend.connection.close()
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backend = we.CsvBackend(self.directory)
+        self.backend.write_workouts(ROWS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_journal_of_replaced_base_is_ignored(self):
+        store = we.WorkoutStore(self.backend)
+        store.load()
+        store.update("2", ROWS[1][:7] + ["edited"])
+        other = [ROWS[0], ROWS[2]]
+        with open(self.backend.workouts_path + ".new", "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(we.WORKOUT_HEADER)
+            writer.writerows(other)
+        os.replace(self.backend.workouts_path + ".new", self.backend.workouts_path)
+        self.assertEqual(list(we.WorkoutStore(we.CsvBackend(self.directory)).load()), other)
+
+    def test_put_for_unknown_id_is_dropped(self):
+        self.backend.append_journal([["put"] + ROWS[0][:8] + ["99"]])
+        self.assertEqual(list(we.WorkoutStore(self.backend).load()), ROWS)
+
+class UpdateDeletedTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        we.CsvBackend(self.directory).write_workouts(ROWS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_update_after_delete(self, backend):
+        store = we.WorkoutStore(backend)
+        store.load()
+        store.delete(["2"])
+        with self.assertRaises(KeyError):
+            store.update("2", ROWS[1][:7] + ["edited"])
+        self.assertEqual(list(store.records), ["1", "3"])
+        self.assertEqual([row[8] for row in we.WorkoutStore(type(backend)(self.directory)).load()], ["1", "3"])
+
+    def test_csv(self):
+        self.check_update_after_delete(we.CsvBackend(self.directory))
+
+    def test_sqlite(self):
+        we.migrate_to_sqlite(self.directory).connection.close()
+        self.check_update_after_delete(we.SqliteBackend(self.directory))
+
+class ReportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        we.CsvBackend(self.directory).write_workouts(ROWS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_invalid_goals_are_skipped(self):
+        backend = we.CsvBackend(self.directory)
+        backend.write_goals([["Run", "abc", "Weekly"], ["Run", "10", "Monthly"], ["Run", "5", "bogus"]])
+        rows = we.goal_rows(we.WorkoutStore(backend), now=we.datetime(2024, 3, 20))
+        self.assertEqual(rows, [(1, ("Run", "10.00 km", "Monthly", "5.00/10.00 km"))])
+
+    def test_goal_progress_matches_across_backends(self):
+        backend = we.CsvBackend(self.directory)
+        backend.write_goals([["Run", "10", "Monthly"], ["Swim", "1000", "01.03.2024-02.03.2024"], ["Walk", "5", "Yearly"]])
+        now = we.datetime(2024, 3, 20)
+        rows = we.goal_rows(we.WorkoutStore(backend), now=now)
+        sqlite = we.migrate_to_sqlite(self.directory)
+        self.assertEqual(we.goal_rows(we.WorkoutStore(sqlite), now=now), rows)
+        self.assertEqual([row[1][3] for row in rows], ["5.00/10.00 km", "0.00/1000.00 m", "3.20/5.00 km"])
+        sqlite.connection.close()
+
+    def test_same_directory_names_get_distinct_reports(self):
+        self.assertEqual(we.report_names(["a/data", "b/data", "runs"]), ["a_data", "b_data", "runs"])
+        self.assertEqual(we.report_names(["data", "data"]), ["data", "data-2"])
+
+class GraphTest(unittest.TestCase):
+    def test_cli_and_window_trim_edge_buckets_alike(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        rows = [[f"{day:02d}.{month:02d}.2024 08:00", "Run", "", "", "", "10.00", "5:00", "", str(month * 100 + day)]
+                for month in (1, 2, 3) for day in (5, 25)]
+        we.CsvBackend(directory).write_workouts(rows)
+        store = we.WorkoutStore(we.CsvBackend(directory))
+        start, end = we.datetime(2024, 1, 20), we.datetime(2024, 3, 10)
+        graph = we.graph_series(store, "Run", "Distance", start, end, "Month")
+        window = we.graph_window(store.pyramid(), "Run", "Distance", (start - we.EPOCH).days, (end - we.EPOCH).days, "Month")
+        self.assertEqual(graph["series"]["Run"][1].tolist(), [10.0, 20.0, 10.0])
+        self.assertEqual(window["series"]["Run"][1].tolist(), [10.0, 20.0, 10.0])
+
+class CollidingImporter(we.WorkoutImporter):
+    @classmethod
+    def key(cls, row):
+        return 0
+
+class ImporterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        we.CsvBackend(self.directory).write_workouts(ROWS)
+        self.path = os.path.join(self.directory, "import.csv")
+        with open(self.path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(we.LEGACY_WORKOUT_HEADER)
+            writer.writerow(ROWS[0][:8])  # Already stored
+            writer.writerow(["04.03.2024 07:30", "run", "", "", "", "6.00", "5:10", ""])
+            writer.writerow([])
+            writer.writerow(["4.3.2024 07:30", "Run", "", "", "", "6.00", "05:10", ""])  # Same row after normalizing
+            writer.writerow(["31.02.2024 07:30", "Run", "", "", "", "6.00", "5:10", ""])
+            writer.writerow(["05.03.2024 07:30", "Swim", "", "", "", "n/a", "2:00", ""])
+            writer.writerow(["05.03.2024 09:00", "Walk", "", "", "", "2.00", "12:00", "new"])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_import(self, importer_class):
+        store = we.WorkoutStore(we.CsvBackend(self.directory))
+        summary = importer_class(store, chunk_size=1).run(self.path)
+        self.assertEqual(summary["imported"], 2)
+        self.assertEqual(summary["duplicates"], 2)
+        self.assertEqual(summary["rejected"], {"invalid date": 1, "invalid distance": 1})
+        self.assertEqual([row[:8] for row in list(store.load())[3:]],
+                         [["04.03.2024 07:30", "Run", "", "", "", "6.00", "05:10", ""],
+                          ["05.03.2024 09:00", "Walk", "", "", "", "2.00", "12:00", "new"]])
+
+    def test_duplicates_and_invalid_rows_are_skipped(self):
+        self.check_import(we.WorkoutImporter)
+
+    def test_hash_collisions_are_confirmed_against_rows(self):
+        self.check_import(CollidingImporter)
+
+class RecordsTest(unittest.TestCase):
+    ROWS = [
+        ["01.03.2024 07:30", "Run", "", "", "", "5.00", "5:00", "", "1"],
+        ["01.03.2024 08:00", "Run", "", "", "", "5", "05:00", "said \"hi\", left", "2"],
+        ["02.03.2024 09:15", "Walk", "", "", "", "", "", "", "3"],
+        ["03.03.2024 12:00", "Swim", "", "", "", "800", "2:05", "", "4"],
+        ["4.3.2024 06:00", "Run", "3", "10", "20", "n/a", "100:00", "", "5"],
+        ["05.03.2024 06:00", "Run", "", "", "", "007", "5.25", "", "6"],
+        ["06.03.2024 06:00", "Walk", "", "", "", "3.20", "5:7", "", "7"],
+    ]
+
+    def records(self):
+        return we.WorkoutRecords(self.ROWS, [row[8] for row in self.ROWS])
+
+    def test_rows_print_back_exactly(self):
+        records = self.records()
+        self.assertEqual(list(records.values()), self.ROWS)
+        self.assertEqual([records[row[8]] for row in self.ROWS], self.ROWS)
+        # Only rows that can't be rebuilt from the arrays keep their text
+        self.assertEqual(sorted(records.texts), [5, 6, 7])
+
+    def test_columns(self):
+        columns = self.records().columns()
+        self.assertEqual(columns.pace.tolist(), [300, 300, -1, 125, 6000, 315, 307])
+        self.assertEqual(columns.distance[:4].tolist()[:2], [5000.0, 5000.0])
+        self.assertTrue(np.isnan(columns.distance[2]))
+        self.assertEqual(columns.distance[3], 800.0)
+        self.assertEqual(columns.date.tolist(), we.parse_timestamps(row[0] for row in self.ROWS).tolist())
+
+    def test_edit_delete_and_copy(self):
+        records = self.records()
+        copy = records.copy()
+        records["3"] = ["02.03.2024 09:15", "Walk", "", "", "", "4.10", "11:30", "edited", "3"]
+        del records["1"]
+        records["8"] = ["07.03.2024 07:00", "Run", "", "", "", "10.00", "4:59", "", "8"]
+        self.assertEqual(list(records), ["2", "3", "4", "5", "6", "7", "8"])
+        self.assertEqual(records["3"][5:8], ["4.10", "11:30", "edited"])
+        self.assertNotIn("1", records)
+        self.assertEqual(list(copy.values()), self.ROWS)
+
+class TimestampTest(unittest.TestCase):
+    TEXTS = ["01.03.2024 07:30", "29.02.2024 23:59", "4.3.2024 06:00", '"05.03.2024 06:00"',
+             "29.02.2023 10:00", "31.04.2024 10:00", "01.13.2024 10:00", "01.03.2024 24:00", "", "soon"]
+
+    def test_parse_timestamp(self):
+        self.assertEqual(we.parse_timestamp("01.01.1970 00:01"), 1)
+        self.assertEqual(we.parse_timestamp("4.3.2024 06:00"), we.parse_timestamp("04.03.2024 06:00"))
+        self.assertEqual(we.parse_timestamp('"05.03.2024 06:00"'), we.parse_timestamp("05.03.2024 06:00"))
+        for text in self.TEXTS[4:]:
+            with self.assertRaises(ValueError):
+                we.parse_timestamp(text)
+
+    def test_parse_timestamps_matches_single_parse(self):
+        minutes, exact = we.parse_timestamps(self.TEXTS, exact=True)
+        expected = []
+        for text in self.TEXTS:
+            try:
+                expected.append(we.parse_timestamp(text))
+            except ValueError:
+                expected.append(-1)
+        self.assertEqual(minutes.tolist(), expected)
+        self.assertEqual(exact.tolist(), [True, True] + [False] * 8)
+        self.assertEqual([we.format_timestamp(value) for value in minutes[:2].tolist()], self.TEXTS[:2])
+
+class StreakTest(unittest.TestCase):
+    def row(self, day, exercise="Run", pace="5:00"):
+        return [f"{day:02d}.03.2024 08:00", exercise, "", "", "", "5.00", pace, "", str(day)]
+
+    def tracker(self, rows):
+        tracker = we.StreakTracker()
+        tracker.rebuild(we.WorkoutColumns(rows))
+        return tracker
+
+    def test_runs_of_days(self):
+        rows = [self.row(day) for day in (1, 2, 2, 3, 5, 6)] + [self.row(4, "Swim"), self.row(7, pace="")]
+        tracker = self.tracker(rows)
+        today = (we.datetime(2024, 3, 7) - we.EPOCH).days
+        self.assertEqual(tracker.longest("Run"), 3)
+        self.assertEqual(tracker.longest(), 6)
+        self.assertEqual(tracker.current(today, "Run"), 2)  # The workout without a pace doesn't count
+        self.assertEqual(tracker.current(today + 2), 0)
+
+    def test_incremental_updates_match_rebuild(self):
+        rows = [self.row(day) for day in (1, 2, 3, 5, 6, 8)]
+        tracker = self.tracker(rows)
+        for row in (self.row(4), self.row(7, "Walk")):
+            tracker.add(row)
+            rows.append(row)
+        tracker.remove(rows[1])
+        del rows[1]
+        rebuilt = self.tracker(rows)
+        for activity in (None, "Run", "Walk"):
+            self.assertEqual(tracker.longest(activity), rebuilt.longest(activity))
+        self.assertEqual(tracker.longest("Run"), 4)  # Days 3-6
+        self.assertEqual(tracker.longest(), 6)  # Days 3-8 with the walk
+
+class CompactionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backend = we.CsvBackend(self.directory)
+        self.backend.write_workouts(ROWS)
+        self.store = we.WorkoutStore(self.backend)
+        self.store.load()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def reload(self):
+        return list(we.WorkoutStore(we.CsvBackend(self.directory)).load())
+
+    def test_edits_made_while_compacting_survive(self):
+        self.store.update("1", ROWS[0][:7] + ["first"])
+        write_base = self.backend.write_base
+
+        def write_base_during_edit(rows):
+            self.store.update("3", ROWS[2][:7] + ["during"])
+            return write_base(rows)
+
+        self.backend.write_base = write_base_during_edit
+        self.assertTrue(self.store.compact())
+        with open(self.backend.workouts_path, newline="") as file:
+            self.assertIn(ROWS[0][:7] + ["first", "1"], list(csv.reader(file)))
+        with open(self.backend.journal_path, newline="") as file:
+            journal = list(csv.reader(file))
+        self.assertEqual(journal[1:], [["put"] + ROWS[2][:7] + ["during", "3"]])
+        self.assertEqual([row[7] for row in self.reload()], ["first", "", "during"])
+
+    def test_compaction_gives_up_when_the_base_grows(self):
+        self.store.update("2", ROWS[1][:7] + ["edited"])
+        write_base = self.backend.write_base
+
+        def write_base_during_append(rows):
+            with open(self.backend.workouts_path, "a", newline="") as file:
+                csv.writer(file).writerow(["04.03.2024 08:00", "Run", "", "", "", "1.00", "6:00", "synced", "10"])
+            return write_base(rows)
+
+        self.backend.write_base = write_base_during_append
+        self.assertFalse(self.store.compact())
+        self.assertFalse(os.path.exists(self.backend.workouts_path + ".tmp"))
+        self.assertEqual([row[7] for row in self.reload()], ["morning", "edited", "pool", "synced"])
+
+class ReimportTest(unittest.TestCase):
+    def test_export_imports_as_duplicates(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        backend = we.CsvBackend(directory)
+        backend.write_workouts(ROWS)
+        store = we.WorkoutStore(backend)
+        store.update("2", ROWS[1][:7] + ["edited"])
+        path = os.path.join(directory, "export.csv")
+        backend.export_workouts(path)
+        summary = we.WorkoutImporter(store).run(path)
+        self.assertEqual((summary["imported"], summary["duplicates"], summary["rejected"]), (0, 3, {}))
+
+if __name__ == "__main__":
+    unittest.main()
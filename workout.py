@@ -1,12 +1,184 @@
+import time
+STARTED_AT = time.perf_counter()  # --measure-startup counts the imports below as well
 import csv
+import sys
 import tkinter as tk
 from tkinter import messagebox, filedialog, ttk, colorchooser
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from datetime import datetime, timedelta
-from PIL import Image, ImageTk
-import mplcursors
-import shutil
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from workout_engine import (
+    LEGACY_WORKOUT_HEADER, WORKOUT_HEADER, PROFILE_HEADER, GRAPH_COLORS, GRAPH_GRANULARITIES, GRAPH_MARKER_POINTS, EPOCH,
+    parse_timestamp, format_pace, goal_range, bucket_label, graph_window,
+    SqliteBackend, open_backend, migrate_to_sqlite, WorkoutStore, WorkoutImporter,
+    stats_report, goal_rows, achievements_report, history_view, history_display_row, SPANS,
+)
+
+HISTORY_BUFFER_ROWS = 5
+HISTORY_RETRY_MS = 50  # How soon History asks for its rows again while a worker holds the store
+# Tabs that show workouts and reload when they change, and the widget options a theme change remaps
+WORKOUT_TABS = ("history", "graphs", "stats", "goals", "profile")
+THEME_ROLES = {"bg": ("bg", "button_bg", "active_bg", "entry_bg"), "fg": ("fg",), "activebackground": ("active_bg",)}
+ICON_SIZE = 20
+ICON_CACHE_DIR = os.path.join("pics", "cache")
+STARTUP_BUDGET_MS = 1000
+PROFILE_DIR = "profiles"
+GRAPH_MIN_WIDTH_PX = 400  # Assumed plot width before the Graphs canvas is first laid out
+WATCH_MS = 2000  # How often the data files are checked for changes made outside the app
+GRAPH_ZOOM_STEP = 1.25  # Visible range factor per scroll wheel step
+GRAPH_SPAN_DAYS = (7, 365 * 100)  # Narrowest and widest visible range when zooming
+HOVER_RADIUS_PX = 15
+
+class TaskScheduler:
+    # Runs loading and aggregation on a thread pool and hands results back on the Tk thread.
+    # Each task has a key (usually a view); submitting again under the same key, or cancelling it,
+    # makes any earlier result for that key stale so it is dropped instead of delivered.
+    def __init__(self, root, workers=2, poll_ms=25):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="workout-task")
+        self.results = queue.Queue()
+        self.notices = queue.Queue()
+        self.generations = {}
+        self.futures = {}
+        self.writes = 0
+        self.inline = False
+        self.root.after(self.poll_ms, self.poll)
+
+    def submit(self, key, func, on_done):
+        if self.inline:
+            # Used while profiling a view, so one profile covers its whole render
+            self.cancel(key)
+            on_done(func())
+            return None
+        generation = self.generations.get(key, 0) + 1
+        self.generations[key] = generation
+        previous = self.futures.get(key)
+        if previous is not None:
+            previous.cancel()
+        future = self.executor.submit(func)
+        self.futures[key] = future
+        future.add_done_callback(lambda done: self.results.put((key, generation, done, on_done)))
+        return future
+
+    def run(self, func, on_done):
+        # Writes are never stale, so each one gets its own key and survives view switches
+        self.writes += 1
+        return self.submit(("write", self.writes), func, on_done)
+
+    def notify(self, callback, *args):
+        # Lets a running task call back into Tk (e.g. progress updates); delivered on the next poll
+        self.notices.put((callback, args))
+
+    def cancel(self, *keys):
+        for key in keys:
+            self.generations[key] = self.generations.get(key, 0) + 1
+            future = self.futures.pop(key, None)
+            if future is not None:
+                future.cancel()
+
+    def poll(self):
+        try:
+            while True:
+                try:
+                    callback, args = self.notices.get_nowait()
+                except queue.Empty:
+                    break
+                callback(*args)
+            while True:
+                key, generation, future, on_done = self.results.get_nowait()
+                if future.cancelled() or self.generations.get(key) != generation:
+                    continue
+                self.futures.pop(key, None)
+                error = future.exception()
+                if error is not None:
+                    self.root.report_callback_exception(type(error), error, error.__traceback__)
+                else:
+                    on_done(future.result())
+        except queue.Empty:
+            pass
+        finally:
+            self.root.after(self.poll_ms, self.poll)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class GraphHover:
+    # Hover tooltips for the Graphs canvas. Points near the pointer are found by binary search over
+    # each series' sorted x values, and the tooltip is blitted over a background cached after every
+    # full draw, so mouse motion never redraws the figure.
+    def __init__(self, canvas, ax, describe, radius=HOVER_RADIUS_PX):
+        self.canvas = canvas
+        self.ax = ax
+        self.describe = describe  # (label, index, y) -> tooltip text
+        self.radius = radius
+        self.series = {}
+        self.background = None
+        self.target = None
+        self.annotation = ax.annotate("", xy=(0, 0), xytext=(12, 12), textcoords="offset points",
+                                      bbox={"boxstyle": "round", "alpha": 0.9}, animated=True, visible=False)
+        canvas.mpl_connect("draw_event", self.on_draw)
+        canvas.mpl_connect("motion_notify_event", self.on_motion)
+        canvas.mpl_connect("figure_leave_event", lambda event: self.hide())
+
+    def set_series(self, series):
+        # {label: (x sorted ascending, y)} of the visible lines
+        self.series = {label: (np.asarray(x, dtype=float), np.asarray(y, dtype=float)) for label, (x, y) in series.items()}
+        self.target = None
+
+    def style(self, facecolor, color):
+        self.annotation.get_bbox_patch().set_facecolor(facecolor)
+        self.annotation.set_color(color)
+
+    def on_draw(self, event):
+        # The tooltip is animated, so a full draw leaves it out and the new background is clean
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.target = None
+
+    def nearest(self, px, py):
+        to_pixels = self.ax.transData.transform
+        x_low = self.ax.transData.inverted().transform((px - self.radius, py))[0]
+        x_high = self.ax.transData.inverted().transform((px + self.radius, py))[0]
+        best, best_distance = None, self.radius
+        for label, (x, y) in self.series.items():
+            low = np.searchsorted(x, x_low, side="left")
+            high = np.searchsorted(x, x_high, side="right")
+            if low >= high:
+                continue
+            points = to_pixels(np.column_stack((x[low:high], y[low:high])))
+            distances = np.hypot(points[:, 0] - px, points[:, 1] - py)
+            distances[np.isnan(distances)] = np.inf
+            i = int(np.argmin(distances))
+            if distances[i] <= best_distance:
+                best, best_distance = (label, int(low) + i), distances[i]
+        return best
+
+    def on_motion(self, event):
+        if event.inaxes is not self.ax or self.background is None or event.button is not None:
+            self.hide()
+            return
+        target = self.nearest(event.x, event.y)
+        if target == self.target:
+            return
+        self.target = target
+        self.canvas.restore_region(self.background)
+        if target is not None:
+            label, i = target
+            x, y = self.series[label]
+            self.annotation.xy = (x[i], y[i])
+            self.annotation.set_text(self.describe(label, i, y[i]))
+            self.annotation.set_visible(True)
+            self.ax.draw_artist(self.annotation)
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def hide(self):
+        if self.target is None or self.background is None:
+            return
+        self.target = None
+        self.canvas.restore_region(self.background)
+        self.canvas.blit(self.canvas.figure.bbox)
 
 class WorkoutTrackerApp:
     def __init__(self, root):
@@ -18,24 +190,29 @@ class WorkoutTrackerApp:
             "light": {"bg": "#ECF0F1", "fg": "#2C3E50", "button_bg": "#D5D8DC", "active_bg": "#3498DB", "entry_bg": "#FFFFFF"}
         }
         self.current_theme = self.load_theme()
-        self.current_view = "log"
+        self.current_view = None
+        self.tabs = {}
+        self.dirty = set(WORKOUT_TABS) | {"plans"}
+        self.tab_loaders = {"history": self.update_history, "graphs": self.update_graph, "stats": self.update_stats,
+                            "goals": self.update_goals, "plans": self.update_plans, "profile": self.update_achievements}
+        self.store = WorkoutStore(open_backend())
+        self.scheduler = TaskScheduler(root)
+        self.graph_fig = self.graph_canvas = self.graph_hover = self.current_fig = None
+        self.graph_pyramid = self.graph_drag = None
+        self.history_retry = None
+        self.graph_lines = {}
+        self.import_window = None
+        self.busy_window = None
+        self.timings_window = None
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.bind("<F11>", self.profile_view)
+        self.root.bind("<F12>", self.toggle_timings)
+        self.root.after(WATCH_MS, self.watch_data)
 
         # Load theme icons with fallback
-        try:
-            self.dark_icon = ImageTk.PhotoImage(Image.open("pics/night.png").resize((20, 20)))
-        except FileNotFoundError:
-            self.dark_icon = None
-            print("Warning: night.png not found, using text fallback")
-        try:
-            self.light_icon = ImageTk.PhotoImage(Image.open("pics/sun.png").resize((20, 20)))
-        except FileNotFoundError:
-            self.light_icon = None
-            print("Warning: sun.png not found, using text fallback")
-        try:
-            self.profile_icon = ImageTk.PhotoImage(Image.open("pics/profile.png").resize((20, 20)))
-        except FileNotFoundError:
-            self.profile_icon = None
-            print("Warning: profile.png not found, using text fallback")
+        self.dark_icon = self.load_icon("night")
+        self.light_icon = self.load_icon("sun")
+        self.profile_icon = self.load_icon("profile")
 
         self.style = ttk.Style()
         self.content_frame = tk.Frame(root, bg=self.themes[self.current_theme]["bg"])
@@ -62,8 +239,11 @@ class WorkoutTrackerApp:
 
         self.theme_button = tk.Button(button_frame, image=self.dark_icon if self.dark_icon else None, text="Dark" if not self.dark_icon else "", compound="left", bg=self.themes[self.current_theme]["button_bg"], bd=0, command=self.switch_theme)
         self.theme_button.pack(side="right", padx=5)
+        self.nav_buttons = {"log": self.log_button, "history": self.history_button, "graphs": self.graphs_button, "stats": self.stats_button,
+                            "goals": self.goals_button, "plans": self.plans_button, "profile": self.profile_button}
 
         self.apply_theme()
+        self.show_log()
 
     def load_theme(self):
         try:
@@ -93,7 +273,7 @@ class WorkoutTrackerApp:
                 writer.writerow(["theme"])
                 writer.writerow([self.current_theme])
 
-    def apply_theme(self):
+    def apply_theme(self, old_theme=None):
         theme = self.themes[self.current_theme]
         self.root.configure(bg=theme["bg"])
         for widget in self.root.winfo_children():
@@ -108,7 +288,15 @@ class WorkoutTrackerApp:
                 else:
                     widget.configure(bg=theme["button_bg"], fg=theme["fg"], activebackground=theme["active_bg"])
         self.update_style()
-        self.refresh_view()
+        if old_theme is not None:
+            # Built tabs keep their widgets and data, only their colors change
+            self.restyle(self.content_frame, old_theme, theme)
+            if hasattr(self, "tree"):
+                self.style_history_tags()
+            if self.graph_fig is not None:
+                self.style_graph()
+                self.graph_canvas.draw_idle()
+        self.highlight_nav()
 
     def update_style(self):
         theme = self.themes[self.current_theme]
@@ -122,6 +310,7 @@ class WorkoutTrackerApp:
         self.root.option_add("*TCombobox*Listbox.font", ("Arial", 14, "bold"))
 
     def switch_theme(self):
+        old_theme = dict(self.themes[self.current_theme])
         if self.current_theme == "dark":
             self.current_theme = "light"
         elif self.current_theme == "light":
@@ -129,7 +318,7 @@ class WorkoutTrackerApp:
         else:  # Custom theme, switch to dark
             self.current_theme = "dark"
         self.save_theme()
-        self.apply_theme()
+        self.apply_theme(old_theme)
 
     def create_custom_theme(self):
         custom_window = tk.Toplevel(self.root)
@@ -156,68 +345,200 @@ class WorkoutTrackerApp:
             self.custom_colors[key].set(color)
 
     def save_custom_theme(self):
+        old_theme = dict(self.themes[self.current_theme])
         self.themes["custom"] = {key: self.custom_colors[key].get() for key in self.custom_colors}
         self.current_theme = "custom"
         self.save_theme()
-        self.apply_theme()
+        self.apply_theme(old_theme)
 
-    def clear_content(self):
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+    def load_icon(self, name, size=ICON_SIZE):
+        # Icons are resized once and cached as PNGs that Tk loads natively, so PIL is only
+        # imported when the cached copy is missing or older than the source image
+        source = os.path.join("pics", f"{name}.png")
+        cached = os.path.join(ICON_CACHE_DIR, f"{name}_{size}.png")
+        try:
+            if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(source):
+                from PIL import Image
+                image = Image.open(source).resize((size, size))
+                try:
+                    os.makedirs(ICON_CACHE_DIR, exist_ok=True)
+                    image.save(cached)
+                except OSError:
+                    from PIL import ImageTk
+                    return ImageTk.PhotoImage(image)
+            return tk.PhotoImage(file=cached)
+        except FileNotFoundError:
+            print(f"Warning: {name}.png not found, using text fallback")
+            return None
+
+    def measure_startup(self, budget_ms=STARTUP_BUDGET_MS):
+        # Draws the first frame, reports how long it took since the process started and exits;
+        # the exit status is 1 when the budget is exceeded
+        constructed = time.perf_counter()
+        self.root.update()
+        first_frame = time.perf_counter()
+        total_ms = (first_frame - STARTED_AT) * 1000
+        print(f"startup: first frame after {total_ms:.1f} ms "
+              f"(imports and app setup {(constructed - STARTED_AT) * 1000:.1f} ms, drawing {(first_frame - constructed) * 1000:.1f} ms, "
+              f"budget {budget_ms} ms)")
+        self.close()
+        return 0 if total_ms <= budget_ms else 1
+
+    def toggle_timings(self, event=None):
+        # Debug overlay with the per-view breakdown of the recorded spans (F12)
+        if self.timings_window is not None and self.timings_window.winfo_exists():
+            self.timings_window.destroy()
+            self.timings_window = None
+            return
+        self.timings_window = tk.Toplevel(self.root)
+        self.timings_window.title("Timings")
+        columns = ("View", "Phase", "Count", "Last ms", "Mean ms", "Max ms", "Peak KiB")
+        self.timings_tree = ttk.Treeview(self.timings_window, columns=columns, show="headings", height=20)
+        for column in columns:
+            self.timings_tree.heading(column, text=column)
+            self.timings_tree.column(column, width=80 if column not in ("View", "Phase") else 100)
+        self.timings_tree.pack(fill="both", expand=True)
+        self.refresh_timings()
+
+    def refresh_timings(self):
+        if self.timings_window is None or not self.timings_window.winfo_exists():
+            return
+        self.timings_tree.delete(*self.timings_tree.get_children())
+        for (view, phase), entry in sorted(SPANS.breakdown().items()):
+            peak = f"{entry['peak'] / 1024:.0f}" if entry["peak"] is not None else ""
+            self.timings_tree.insert("", "end", values=(view, phase, entry["count"], f"{entry['last'] * 1000:.1f}",
+                                                       f"{entry['mean'] * 1000:.1f}", f"{entry['max'] * 1000:.1f}", peak))
+        self.timings_window.after(500, self.refresh_timings)
+
+    def profile_view(self, event=None):
+        # Renders the current view once under cProfile (F11), running its tasks on the Tk thread,
+        # and saves the stats to PROFILE_DIR
+        import cProfile
+        import io
+        import pstats
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{self.current_view}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+        profiler = cProfile.Profile()
+        self.scheduler.inline = True
+        profiler.enable()
+        try:
+            self.refresh_view()
+            self.root.update_idletasks()
+        finally:
+            profiler.disable()
+            self.scheduler.inline = False
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+        print(summary.getvalue(), file=sys.stderr)
+        messagebox.showinfo("Profile Saved", f"Profile of the {self.current_view} view saved to {path}")
+
+    def close(self):
+        self.scheduler.shutdown()
+        self.store.flush()
+        self.root.destroy()
+
+    def show_tab(self, name):
+        # Tabs are built on first use and then only hidden and shown again; a tab reloads its
+        # data when it becomes visible after the data it shows has changed
+        if self.current_view in self.tabs:
+            self.tabs[self.current_view].pack_forget()
+        if name not in self.tabs:
+            self.tabs[name] = tk.Frame(self.content_frame, bg=self.themes[self.current_theme]["bg"])
+            getattr(self, f"build_{name}")(self.tabs[name])
+        self.tabs[name].pack(fill="both", expand=True)
+        self.current_view = name
+        self.highlight_nav()
+        if name in self.dirty:
+            self.refresh_view()
+
+    def highlight_nav(self):
+        theme = self.themes[self.current_theme]
+        for name, button in self.nav_buttons.items():
+            button.config(bg=theme["active_bg"] if name == self.current_view else theme["button_bg"])
 
     def refresh_view(self):
-        self.clear_content()
-        if self.current_view == "log":
-            self.show_log()
-        elif self.current_view == "history":
-            self.show_history()
-        elif self.current_view == "graphs":
-            self.show_graphs()
-        elif self.current_view == "stats":
-            self.show_stats()
-        elif self.current_view == "goals":
-            self.show_goals()
-        elif self.current_view == "plans":
-            self.show_plans()
-        elif self.current_view == "profile":
-            self.show_profile()
-
+        # Reloads the data of the visible tab
+        self.dirty.discard(self.current_view)
+        loader = self.tab_loaders.get(self.current_view)
+        if loader is not None:
+            loader()
+
+    def data_changed(self):
+        # Workouts were added, edited, deleted or replaced: every tab showing them is stale
+        self.dirty.update(WORKOUT_TABS)
+        if self.current_view in self.dirty:
+            self.refresh_view()
+
+    def watch_data(self):
+        # Picks up workouts changed outside the app, e.g. rows appended to workouts.csv by a sync
+        # tool; the visible tab reloads, and the store only parses the appended rows
+        if self.store.changed():
+            self.data_changed()
+        self.root.after(WATCH_MS, self.watch_data)
+
+    def restyle(self, widget, old, new):
+        # Swaps every color the widgets took from the old theme for the same role in the new one
+        for child in widget.winfo_children():
+            if isinstance(child, (tk.Frame, tk.Label, tk.Button, tk.Entry, tk.Text)):
+                options = child.keys()
+                for option, roles in THEME_ROLES.items():
+                    if option not in options:
+                        continue
+                    value = child.cget(option)
+                    for role in roles:
+                        if value == old[role]:
+                            child.configure(**{option: new[role]})
+                            break
+            self.restyle(child, old, new)
+
+    @SPANS.traced("log", "show")
     def show_log(self):
-        self.clear_content()
-        self.current_view = "log"
-        self.log_button.config(bg=self.themes[self.current_theme]["active_bg"])
-        self.history_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.graphs_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.stats_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.goals_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.plans_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.profile_button.config(bg=self.themes[self.current_theme]["button_bg"])
+        self.show_tab("log")
 
+    @SPANS.traced("history", "show")
+    def show_history(self):
+        self.show_tab("history")
+        self.render_history_window()
+
+    @SPANS.traced("graph", "show")
+    def show_graphs(self):
+        self.show_tab("graphs")
+
+    @SPANS.traced("stats", "show")
+    def show_stats(self):
+        self.show_tab("stats")
+
+    @SPANS.traced("goals", "show")
+    def show_goals(self):
+        self.show_tab("goals")
+
+    @SPANS.traced("plans", "show")
+    def show_plans(self):
+        self.show_tab("plans")
+
+    @SPANS.traced("profile", "show")
+    def show_profile(self):
+        self.show_tab("profile")
+
+    @SPANS.traced("log", "build")
+    def build_log(self, frame):
         theme = self.themes[self.current_theme]
-        button_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        button_frame = tk.Frame(frame, bg=theme["bg"])
         button_frame.pack(pady=10)
         btn_style = {"font": ("Arial", 15), "bg": theme["active_bg"], "fg": "white", "width": 18, "bd": 0, "activebackground": "#2980B9"}
         tk.Button(button_frame, text="Run", command=self.show_run, **btn_style).pack(pady=5)
         tk.Button(button_frame, text="Swim", command=self.show_swim, **btn_style).pack(pady=5)
         tk.Button(button_frame, text="Walk", command=self.show_walking, **btn_style).pack(pady=5)
 
-        self.input_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        self.input_frame = tk.Frame(frame, bg=theme["bg"])
         self.input_frame.pack(pady=20)
         self.show_run()  # Default view
 
-    def show_history(self):
-        self.clear_content()
-        self.current_view = "history"
-        self.log_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.history_button.config(bg=self.themes[self.current_theme]["active_bg"])
-        self.graphs_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.stats_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.goals_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.plans_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.profile_button.config(bg=self.themes[self.current_theme]["button_bg"])
-
+    @SPANS.traced("history", "build")
+    def build_history(self, frame):
         theme = self.themes[self.current_theme]
-        filter_frame = tk.Frame(self.content_frame, bg=theme["button_bg"], bd=2, relief="groove")
+        filter_frame = tk.Frame(frame, bg=theme["button_bg"], bd=2, relief="groove")
         filter_frame.pack(pady=10, padx=10, fill="x")
         tk.Label(filter_frame, text="Filter by Activity:", font=("Arial", 12, "bold"), fg=theme["fg"], bg=theme["button_bg"]).pack(side="left", padx=10, pady=5)
         self.filter_var = tk.StringVar(value="All")
@@ -226,7 +547,7 @@ class WorkoutTrackerApp:
         self.filter_dropdown.pack(side="left", padx=10, pady=5)
         self.filter_dropdown.bind("<<ComboboxSelected>>", lambda event: self.update_history())
 
-        self.tree = ttk.Treeview(self.content_frame, columns=("Date", "Exercise", "Distance", "Pace", "Notes"), show="headings", height=15, selectmode="extended")
+        self.tree = ttk.Treeview(frame, columns=("Date", "Exercise", "Distance", "Pace", "Notes"), show="headings", height=15, selectmode="extended")
         self.tree.pack(pady=10, padx=10, fill="both", expand=True)
         self.tree.heading("Date", text="Date")
         self.tree.heading("Exercise", text="Exercise")
@@ -238,24 +559,38 @@ class WorkoutTrackerApp:
         self.tree.column("Distance", width=120)
         self.tree.column("Pace", width=150)
         self.tree.column("Notes", width=200)
-        scrollbar = ttk.Scrollbar(self.content_frame, orient="vertical", command=self.tree.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        self.tree.tag_configure("oddrow", background=theme["entry_bg"], foreground=theme["bg"])
-        self.tree.tag_configure("evenrow", background="#D5D8DC" if self.current_theme == "dark" else "#BFC9CA", foreground=theme["bg"])
-
-        stats_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        # The tree only ever holds the rows in view; the scrollbar and wheel move self.history_offset
+        self.history_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.scroll_history)
+        self.history_scrollbar.pack(side="right", fill="y")
+        self.history_positions = np.empty(0, dtype=np.int64)
+        self.history_offset = 0
+        self.history_selection = set()
+        self.history_select_state = None
+        self.tree.bind("<Configure>", lambda event: self.render_history_window())
+        self.tree.bind("<<TreeviewSelect>>", self.on_history_select)
+        self.tree.bind("<Button-1>", self.on_history_click)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_history("scroll", -1 if event.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_history("scroll", -1, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_history("scroll", 1, "units"))
+        self.tree.bind("<Up>", lambda event: self.step_history(event, -1))
+        self.tree.bind("<Down>", lambda event: self.step_history(event, 1))
+        self.style_history_tags()
+
+        stats_frame = tk.Frame(frame, bg=theme["bg"])
         stats_frame.pack(pady=5)
         self.stats_label = tk.Label(stats_frame, text="", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"])
         self.stats_label.pack()
 
-        button_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        button_frame = tk.Frame(frame, bg=theme["bg"])
         button_frame.pack(pady=5)
         tk.Button(button_frame, text="Delete Selected", command=self.delete_records, font=("Arial", 12), bg="#E74C3C", fg="white", width=15, bd=0, activebackground="#C0392B").pack(side="left", padx=5)
         tk.Button(button_frame, text="Edit Selected", command=self.edit_record, font=("Arial", 12), bg="#F1C40F", fg="white", width=15, bd=0, activebackground="#D4AC0D").pack(side="left", padx=5)
         tk.Button(button_frame, text="CSV Options", command=self.csv_options, font=("Arial", 12), bg="#2ECC71", fg="white", width=15, bd=0, activebackground="#27AE60").pack(side="left", padx=5)
 
-        self.update_history()
+    def style_history_tags(self):
+        theme = self.themes[self.current_theme]
+        self.tree.tag_configure("oddrow", background=theme["entry_bg"], foreground=theme["bg"])
+        self.tree.tag_configure("evenrow", background="#D5D8DC" if self.current_theme == "dark" else "#BFC9CA", foreground=theme["bg"])
 
     def csv_options(self):
         menu = tk.Menu(self.root, tearoff=0)
@@ -263,21 +598,14 @@ class WorkoutTrackerApp:
         menu.add_command(label="Import CSV", command=self.import_csv)
         menu.add_command(label="Backup Data", command=self.backup_data)
         menu.add_command(label="Restore Data", command=self.restore_data)
+        if not isinstance(self.store.backend, SqliteBackend):
+            menu.add_command(label="Migrate to SQLite", command=self.migrate_storage)
         menu.tk_popup(self.root.winfo_pointerx(), self.root.winfo_pointery())
 
-    def show_graphs(self):
-        self.clear_content()
-        self.current_view = "graphs"
-        self.log_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.history_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.graphs_button.config(bg=self.themes[self.current_theme]["active_bg"])
-        self.stats_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.goals_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.plans_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.profile_button.config(bg=self.themes[self.current_theme]["button_bg"])
-
+    @SPANS.traced("graph", "build")
+    def build_graphs(self, frame):
         theme = self.themes[self.current_theme]
-        options_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        options_frame = tk.Frame(frame, bg=theme["bg"])
         options_frame.pack(pady=10)
 
         tk.Label(options_frame, text="Activity:", font=("Arial", 12, "bold"), fg=theme["fg"], bg=theme["bg"]).pack(side="left", padx=5)
@@ -293,6 +621,12 @@ class WorkoutTrackerApp:
         self.metric_dropdown.pack(side="left", padx=5)
         self.metric_dropdown.bind("<<ComboboxSelected>>", lambda event: self.update_graph())
 
+        tk.Label(options_frame, text="Per:", font=("Arial", 12, "bold"), fg=theme["fg"], bg=theme["bg"]).pack(side="left", padx=5)
+        self.granularity_var = tk.StringVar(value="Auto")
+        self.granularity_dropdown = ttk.Combobox(options_frame, textvariable=self.granularity_var, values=("Auto",) + GRAPH_GRANULARITIES, state="readonly", width=8)
+        self.granularity_dropdown.pack(side="left", padx=5)
+        self.granularity_dropdown.bind("<<ComboboxSelected>>", lambda event: self.update_graph())
+
         tk.Label(options_frame, text="From (DD.MM.YYYY):", font=("Arial", 12, "bold"), fg=theme["fg"], bg=theme["bg"]).pack(side="left", padx=5)
         self.from_date_entry = tk.Entry(options_frame, font=("Arial", 12), width=12, bg=theme["entry_bg"])
         self.from_date_entry.insert(0, (datetime.now() - timedelta(days=365)).strftime("%d.%m.%Y"))
@@ -303,136 +637,65 @@ class WorkoutTrackerApp:
         self.to_date_entry.insert(0, datetime.now().strftime("%d.%m.%Y"))
         self.to_date_entry.pack(side="left", padx=5)
 
-        self.graph_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        self.graph_status = tk.Label(frame, text="", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"])
+        self.graph_status.pack()
+        self.graph_frame = tk.Frame(frame, bg=theme["bg"])
         self.graph_frame.pack(fill="both", expand=True)
 
-        button_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        button_frame = tk.Frame(frame, bg=theme["bg"])
         button_frame.pack(pady=5)
         tk.Button(button_frame, text="Save Graph", command=self.save_graph, font=("Arial", 12), bg="#2ECC71", fg="white", width=15, bd=0, activebackground="#27AE60").pack(pady=5)
 
-        self.update_graph()
-
-    def show_stats(self):
-        self.clear_content()
-        self.current_view = "stats"
-        self.log_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.history_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.graphs_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.stats_button.config(bg=self.themes[self.current_theme]["active_bg"])
-        self.goals_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.plans_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.profile_button.config(bg=self.themes[self.current_theme]["button_bg"])
-
+    @SPANS.traced("stats", "build")
+    def build_stats(self, frame):
         theme = self.themes[self.current_theme]
-        stats_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        stats_frame = tk.Frame(frame, bg=theme["bg"])
         stats_frame.pack(pady=20)
 
         tk.Label(stats_frame, text="Activity Stats", font=("Arial", 20, "bold"), fg=theme["fg"], bg=theme["bg"]).pack(pady=10)
 
-        stats_text = tk.Text(stats_frame, height=20, width=50, font=("Arial", 12), fg=theme["fg"], bg=theme["bg"], wrap="word")
-        stats_text.pack(pady=5)
+        self.stats_text = tk.Text(stats_frame, height=20, width=50, font=("Arial", 12), fg=theme["fg"], bg=theme["bg"], wrap="word")
+        self.stats_text.pack(pady=5)
 
         # Progress Bar for Monthly Distance (Goal: 50 km)
         progress_frame = tk.Frame(stats_frame, bg=theme["bg"])
         progress_frame.pack(pady=10)
-        monthly_goal = 50.0  # Hardcoded goal for now
+        self.monthly_goal = 50.0  # Hardcoded goal for now
         self.progress_var = tk.DoubleVar(value=0)
-        progress_bar = ttk.Progressbar(progress_frame, maximum=monthly_goal, length=200, variable=self.progress_var)
+        progress_bar = ttk.Progressbar(progress_frame, maximum=self.monthly_goal, length=200, variable=self.progress_var)
         progress_bar.pack(pady=5)
         self.progress_label = tk.Label(progress_frame, text="Distance this month: 0/50 km", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"])
         self.progress_label.pack()
 
-        try:
-            with open("workouts.csv", "r") as file:
-                reader = csv.reader(file)
-                header = next(reader)
-                workouts = [row for row in reader if len(row) == 8]
-
-            if not workouts:
-                stats_text.insert(tk.END, "No workout data available")
-                stats_text.config(state="disabled")
-                self.progress_label.config(text="Distance this month: 0/50 km")
-                return
-
-            stats = {
-                "Run": {"distance": 0.0, "pace": [], "max_distance": 0.0, "min_pace": float('inf')},
-                "Swim": {"distance": 0.0, "pace": [], "max_distance": 0.0, "min_pace": float('inf')},
-                "Walk": {"distance": 0.0, "pace": [], "max_distance": 0.0, "min_pace": float('inf')}
-            }
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-            monthly_distance = 0.0
-            workout_dates = []
-
-            for row in workouts:
-                exercise = row[1].strip('"')
-                distance = row[5].strip('"')
-                pace = row[6].strip('"')
-                date_str = row[0].strip('"')
-                if exercise in stats and distance and pace:
-                    dist_value = float(distance) / 1000 if exercise.lower() == "swim" else float(distance)
-                    pace_value = self.parse_pace(pace)
-                    stats[exercise]["distance"] += dist_value
-                    stats[exercise]["pace"].append(pace_value)
-                    stats[exercise]["max_distance"] = max(stats[exercise]["max_distance"], dist_value)
-                    stats[exercise]["min_pace"] = min(stats[exercise]["min_pace"], pace_value)
-                    # Progress bar calculation
-                    date = datetime.strptime(date_str, "%d.%m.%Y %H:%M")
-                    if date.month == current_month and date.year == current_year:
-                        monthly_distance += dist_value
-                    workout_dates.append(date.date())
-
-            # Update progress bar
-            self.progress_var.set(monthly_distance)
-            self.progress_label.config(text=f"Distance this month: {monthly_distance:.2f}/{monthly_goal} km")
-
-            # Advanced Stats: Longest Streak
-            workout_dates.sort()
-            max_streak = current_streak = 1
-            for i in range(1, len(workout_dates)):
-                if (workout_dates[i] - workout_dates[i-1]).days == 1:
-                    current_streak += 1
-                    max_streak = max(max_streak, current_streak)
-                else:
-                    current_streak = 1
-
-            for activity in stats:
-                total_dist = stats[activity]["distance"]
-                pace_list = stats[activity]["pace"]
-                avg_pace = sum(pace_list) / len(pace_list) if pace_list else 0.0
-                max_dist = stats[activity]["max_distance"]
-                min_pace = stats[activity]["min_pace"] if stats[activity]["min_pace"] != float('inf') else 0.0
-                unit_dist = "km" if activity in ["Run", "Walk"] else "m"
-                unit_pace = "min/km" if activity in ["Run", "Walk"] else "min/100m"
-                avg_pace_str = self.format_pace(avg_pace, unit_pace)
-                min_pace_str = self.format_pace(min_pace, unit_pace) if min_pace > 0 else "N/A"
-                stats_text.insert(tk.END, f"{activity}:\n")
-                stats_text.insert(tk.END, f"Total Distance: {total_dist:.2f} {unit_dist}\n")
-                stats_text.insert(tk.END, f"Average Pace: {avg_pace_str}\n")
-                stats_text.insert(tk.END, f"Fastest Pace: {min_pace_str}\n")
-                stats_text.insert(tk.END, f"Longest {activity}: {max_dist:.2f} {unit_dist}\n\n")
-
-            stats_text.insert(tk.END, f"Longest Workout Streak: {max_streak} days\n")
-            stats_text.config(state="disabled")
-
-        except FileNotFoundError:
-            stats_text.insert(tk.END, "No data available")
-            stats_text.config(state="disabled")
+    @SPANS.traced("stats", "update")
+    def update_stats(self):
+        self.stats_text.config(state="normal")
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, "Loading...")
+        self.stats_text.config(state="disabled")
+        self.scheduler.submit("stats", self.compute_stats, self.render_stats)
+
+    def compute_stats(self):
+        # Runs on a worker thread
+        return stats_report(self.store)
+
+    @SPANS.traced("stats", "insert")
+    def render_stats(self, result):
+        text, monthly_distance = result
+        self.stats_text.config(state="normal")
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.config(state="disabled")
+        if monthly_distance is None:
             self.progress_label.config(text="Distance this month: 0/50 km")
+            return
+        self.progress_var.set(monthly_distance)
+        self.progress_label.config(text=f"Distance this month: {monthly_distance:.2f}/{self.monthly_goal} km")
 
-    def show_goals(self):
-        self.clear_content()
-        self.current_view = "goals"
-        self.log_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.history_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.graphs_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.stats_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.goals_button.config(bg=self.themes[self.current_theme]["active_bg"])
-        self.plans_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.profile_button.config(bg=self.themes[self.current_theme]["button_bg"])
-
+    @SPANS.traced("goals", "build")
+    def build_goals(self, frame):
         theme = self.themes[self.current_theme]
-        goals_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        goals_frame = tk.Frame(frame, bg=theme["bg"])
         goals_frame.pack(pady=20)
 
         tk.Label(goals_frame, text="Goals", font=("Arial", 20, "bold"), fg=theme["fg"], bg=theme["bg"]).pack(pady=10)
@@ -448,7 +711,10 @@ class WorkoutTrackerApp:
         self.goal_target_entry.pack(side="left", padx=5)
         tk.Label(input_frame, text="Period:", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"]).pack(side="left", padx=5)
         self.goal_period_var = tk.StringVar(value="Weekly")
-        ttk.Combobox(input_frame, textvariable=self.goal_period_var, values=["Weekly", "Monthly"], state="readonly", width=10).pack(side="left", padx=5)
+        ttk.Combobox(input_frame, textvariable=self.goal_period_var, values=["Weekly", "Monthly", "Yearly", "Custom"], state="readonly", width=10).pack(side="left", padx=5)
+        tk.Label(input_frame, text="Custom (DD.MM.YYYY-DD.MM.YYYY):", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"]).pack(side="left", padx=5)
+        self.goal_range_entry = tk.Entry(input_frame, font=("Arial", 12), width=22, bg=theme["entry_bg"])
+        self.goal_range_entry.pack(side="left", padx=5)
         tk.Button(input_frame, text="Add Goal", command=self.add_goal, font=("Arial", 12), bg="#2ECC71", fg="white", bd=0, activebackground="#27AE60").pack(side="left", padx=10)
 
         # Goals display
@@ -468,8 +734,6 @@ class WorkoutTrackerApp:
 
         tk.Button(goals_frame, text="Delete Selected", command=self.delete_goal, font=("Arial", 12), bg="#E74C3C", fg="white", width=15, bd=0, activebackground="#C0392B").pack(pady=5)
 
-        self.update_goals()
-
     def add_goal(self):
         activity = self.goal_activity_var.get()
         try:
@@ -478,12 +742,20 @@ class WorkoutTrackerApp:
         except ValueError:
             messagebox.showerror("Error", "Target must be a number")
             return
+        if period == "Custom":
+            period = self.goal_range_entry.get().strip()
+            try:
+                start, end = goal_range(period, datetime.now())
+                if start >= end:
+                    raise ValueError("Empty range")
+            except ValueError:
+                messagebox.showerror("Error", "Custom period must be DD.MM.YYYY-DD.MM.YYYY")
+                return
 
-        with open("goals.csv", "a", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow([activity, target, period])
+        self.store.backend.append_goal([activity, target, period])
         
         self.goal_target_entry.delete(0, tk.END)
+        self.goal_range_entry.delete(0, tk.END)
         self.update_goals()
 
     def delete_goal(self):
@@ -493,64 +765,34 @@ class WorkoutTrackerApp:
             return
         
         selected_values = [self.goals_tree.item(item, "values")[:3] for item in selected_items]  # Exclude progress
-        try:
-            with open("goals.csv", "r") as file:
-                reader = csv.reader(file)
-                all_rows = list(reader)
-        except FileNotFoundError:
-            return
-
+        all_rows = self.store.backend.read_goals()
         updated_rows = [row for row in all_rows if row not in selected_values]
-        with open("goals.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerows(updated_rows)
+        self.store.backend.write_goals(updated_rows)
         
         self.update_goals()
 
+    @SPANS.traced("goals", "update")
     def update_goals(self):
         for item in self.goals_tree.get_children():
             self.goals_tree.delete(item)
-        
-        try:
-            with open("goals.csv", "r") as file:
-                reader = csv.reader(file)
-                goals = list(reader)
-            with open("workouts.csv", "r") as file:
-                reader = csv.reader(file)
-                header = next(reader)
-                workouts = [row for row in reader if len(row) == 8]
-        except FileNotFoundError:
-            goals = []
+        self.goals_tree.insert("", "end", values=("Loading...", "", "", ""))
+        self.scheduler.submit("goals", self.compute_goals, self.render_goals)
 
-        current_time = datetime.now()
-        for i, goal in enumerate(goals):
-            if len(goal) != 3:
-                continue
-            activity, target, period = goal[0], float(goal[1]), goal[2]
-            unit = "km" if activity in ["Run", "Walk"] else "m"
-            start_date = (current_time - timedelta(days=7)) if period == "Weekly" else current_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            progress = 0.0
-            for row in workouts:
-                date = datetime.strptime(row[0].strip('"'), "%d.%m.%Y %H:%M")
-                if date >= start_date and row[1].strip('"') == activity:
-                    dist_value = float(row[5].strip('"')) / 1000 if activity.lower() == "swim" else float(row[5].strip('"'))
-                    progress += dist_value
-            display_row = (activity, f"{target:.2f} {unit}", period, f"{progress:.2f}/{target:.2f} {unit}")
-            self.goals_tree.insert("", "end", values=display_row, tags=("evenrow" if i % 2 == 0 else "oddrow",))
+    def compute_goals(self):
+        # Runs on a worker thread
+        return goal_rows(self.store)
 
-    def show_plans(self):
-        self.clear_content()
-        self.current_view = "plans"
-        self.log_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.history_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.graphs_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.stats_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.goals_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.plans_button.config(bg=self.themes[self.current_theme]["active_bg"])
-        self.profile_button.config(bg=self.themes[self.current_theme]["button_bg"])
+    @SPANS.traced("goals", "insert")
+    def render_goals(self, display_rows):
+        for item in self.goals_tree.get_children():
+            self.goals_tree.delete(item)
+        for i, display_row in display_rows:
+            self.goals_tree.insert("", "end", values=display_row, tags=("evenrow" if i % 2 == 0 else "oddrow",))
 
+    @SPANS.traced("plans", "build")
+    def build_plans(self, frame):
         theme = self.themes[self.current_theme]
-        plans_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        plans_frame = tk.Frame(frame, bg=theme["bg"])
         plans_frame.pack(pady=20)
 
         tk.Label(plans_frame, text="Workout Plans", font=("Arial", 20, "bold"), fg=theme["fg"], bg=theme["bg"]).pack(pady=10)
@@ -587,8 +829,6 @@ class WorkoutTrackerApp:
 
         tk.Button(plans_frame, text="Delete Selected", command=self.delete_plan, font=("Arial", 12), bg="#E74C3C", fg="white", width=15, bd=0, activebackground="#C0392B").pack(pady=5)
 
-        self.update_plans()
-
     def add_plan(self):
         day = self.plan_day_var.get()
         activity = self.plan_activity_var.get()
@@ -599,9 +839,7 @@ class WorkoutTrackerApp:
             return
 
         unit = "km" if activity in ["Run", "Walk"] else "m"
-        with open("plans.csv", "a", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow([day, activity, f"{distance:.2f} {unit}", "No"])
+        self.store.backend.append_plan([day, activity, f"{distance:.2f} {unit}", "No"])
         
         self.plan_distance_entry.delete(0, tk.END)
         self.update_plans()
@@ -613,17 +851,9 @@ class WorkoutTrackerApp:
             return
         
         selected_values = [self.plans_tree.item(item, "values") for item in selected_items]
-        try:
-            with open("plans.csv", "r") as file:
-                reader = csv.reader(file)
-                all_rows = list(reader)
-        except FileNotFoundError:
-            return
-
+        all_rows = self.store.backend.read_plans()
         updated_rows = [row for row in all_rows if tuple(row) not in selected_values]
-        with open("plans.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerows(updated_rows)
+        self.store.backend.write_plans(updated_rows)
         
         self.update_plans()
 
@@ -634,57 +864,33 @@ class WorkoutTrackerApp:
             values[3] = "Yes" if values[3] == "No" else "No"
             self.plans_tree.item(item, values=values)
             
-            with open("plans.csv", "r") as file:
-                reader = csv.reader(file)
-                all_rows = list(reader)
+            all_rows = self.store.backend.read_plans()
             for i, row in enumerate(all_rows):
                 if tuple(row) == self.plans_tree.item(item, "values"):
                     all_rows[i][3] = values[3]
-            with open("plans.csv", "w", newline="") as file:
-                writer = csv.writer(file)
-                writer.writerows(all_rows)
+            self.store.backend.write_plans(all_rows)
 
+    @SPANS.traced("plans", "update")
     def update_plans(self):
         for item in self.plans_tree.get_children():
             self.plans_tree.delete(item)
         
-        try:
-            with open("plans.csv", "r") as file:
-                reader = csv.reader(file)
-                for i, row in enumerate(reader):
-                    if len(row) == 4:
-                        tag = "evenrow" if i % 2 == 0 else "oddrow"
-                        self.plans_tree.insert("", "end", values=row, tags=(tag,))
-        except FileNotFoundError:
-            pass
-
-    def show_profile(self):
-        self.clear_content()
-        self.current_view = "profile"
-        self.log_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.history_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.graphs_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.stats_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.goals_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.plans_button.config(bg=self.themes[self.current_theme]["button_bg"])
-        self.profile_button.config(bg=self.themes[self.current_theme]["active_bg"])
+        for i, row in enumerate(self.store.backend.read_plans()):
+            if len(row) == 4:
+                tag = "evenrow" if i % 2 == 0 else "oddrow"
+                self.plans_tree.insert("", "end", values=row, tags=(tag,))
 
+    @SPANS.traced("profile", "build")
+    def build_profile(self, frame):
         theme = self.themes[self.current_theme]
-        profile_frame = tk.Frame(self.content_frame, bg=theme["bg"])
+        profile_frame = tk.Frame(frame, bg=theme["bg"])
         profile_frame.pack(pady=20)
 
         tk.Label(profile_frame, text="Profile", font=("Arial", 20, "bold"), fg=theme["fg"], bg=theme["bg"]).pack(pady=10)
 
-        fields = ["Name", "Age", "Weight (kg)", "Height (cm)"]
+        fields = PROFILE_HEADER
         self.profile_entries = {}
-        try:
-            with open("profile.csv", "r") as file:
-                reader = csv.reader(file)
-                header = next(reader)
-                data = next(reader, [""] * len(fields))
-                profile_data = dict(zip(fields, data))
-        except FileNotFoundError:
-            profile_data = {field: "" for field in fields}
+        profile_data = dict(zip(fields, self.store.backend.read_profile()))
 
         for field in fields:
             tk.Label(profile_frame, text=f"{field}:", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"]).pack(pady=2)
@@ -698,49 +904,29 @@ class WorkoutTrackerApp:
 
         # Achievements section
         tk.Label(profile_frame, text="Achievements", font=("Arial", 16, "bold"), fg=theme["fg"], bg=theme["bg"]).pack(pady=10)
-        achievements_text = tk.Text(profile_frame, height=10, width=50, font=("Arial", 12), fg=theme["fg"], bg=theme["bg"], wrap="word")
-        achievements_text.pack(pady=5)
-        self.update_achievements(achievements_text)
-        achievements_text.config(state="disabled")
+        self.achievements_text = tk.Text(profile_frame, height=10, width=50, font=("Arial", 12), fg=theme["fg"], bg=theme["bg"], wrap="word")
+        self.achievements_text.pack(pady=5)
 
     def save_profile(self):
-        profile_data = [self.profile_entries[field].get() for field in ["Name", "Age", "Weight (kg)", "Height (cm)"]]
-        with open("profile.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(["Name", "Age", "Weight (kg)", "Height (cm)"])
-            writer.writerow(profile_data)
+        profile_data = [self.profile_entries[field].get() for field in PROFILE_HEADER]
+        self.store.backend.write_profile(profile_data)
         messagebox.showinfo("Success", "Profile saved!")
 
-    def update_achievements(self, text_widget):
-        achievements = {
-            "First 10 km Run": {"type": "Run", "distance": 10, "earned": False},
-            "50 Workouts": {"count": 50, "earned": False},
-            "Fast Swimmer": {"type": "Swim", "pace": 1.5, "earned": False}  # Pace <= 1:30 min/100m
-        }
-        
-        try:
-            with open("workouts.csv", "r") as file:
-                reader = csv.reader(file)
-                header = next(reader)
-                workouts = [row for row in reader if len(row) == 8]
-
-            for row in workouts:
-                exercise = row[1].strip('"')
-                distance = float(row[5].strip('"'))
-                pace = self.parse_pace(row[6].strip('"'))
-                if exercise == "Run" and distance >= 10:
-                    achievements["First 10 km Run"]["earned"] = True
-                if exercise == "Swim" and pace <= 1.5:
-                    achievements["Fast Swimmer"]["earned"] = True
-            if len(workouts) >= 50:
-                achievements["50 Workouts"]["earned"] = True
-
-            for name, details in achievements.items():
-                status = "Earned" if details["earned"] else "Not Earned"
-                text_widget.insert(tk.END, f"{name}: {status}\n")
+    @SPANS.traced("achievements", "update")
+    def update_achievements(self):
+        self.render_achievements("Loading...")
+        self.scheduler.submit("achievements", self.compute_achievements, self.render_achievements)
 
-        except FileNotFoundError:
-            text_widget.insert(tk.END, "No workout data to calculate achievements")
+    @SPANS.traced("achievements", "insert")
+    def render_achievements(self, text):
+        self.achievements_text.config(state="normal")
+        self.achievements_text.delete("1.0", tk.END)
+        self.achievements_text.insert(tk.END, text)
+        self.achievements_text.config(state="disabled")
+
+    def compute_achievements(self):
+        # Runs on a worker thread
+        return achievements_report(self.store)
 
     def parse_pace(self, pace_str):
         try:
@@ -752,17 +938,110 @@ class WorkoutTrackerApp:
         except ValueError:
             raise ValueError("Pace must be in MM:SS format (e.g., 4:50) or a number")
 
-    def format_pace(self, pace_float, unit):
-        minutes = int(pace_float)
-        seconds = int((pace_float - minutes) * 60)
-        return f"{minutes}:{seconds:02d} {unit}"
-
+    @SPANS.traced("graph", "update")
     def update_graph(self):
-        for widget in self.graph_frame.winfo_children():
-            widget.destroy()
+        activity_filter = self.activity_var.get()
+        metric = self.metric_var.get()
+        granularity = self.granularity_var.get()
+        max_points = self.graph_max_points()
+        try:
+            start_date = EPOCH + timedelta(minutes=parse_timestamp(self.from_date_entry.get() + " 00:00"))
+            end_date = EPOCH + timedelta(minutes=parse_timestamp(self.to_date_entry.get() + " 23:59"))
+            if start_date > end_date:
+                raise ValueError("Start date must be before end date")
+        except ValueError as e:
+            messagebox.showerror("Error", str(e) if str(e) != "Start date must be before end date" else "Invalid date format (use DD.MM.YYYY)")
+            start_date = datetime.now() - timedelta(days=365)
+            end_date = datetime.now()
+            self.from_date_entry.delete(0, tk.END)
+            self.from_date_entry.insert(0, start_date.strftime("%d.%m.%Y"))
+            self.to_date_entry.delete(0, tk.END)
+            self.to_date_entry.insert(0, end_date.strftime("%d.%m.%Y"))
+
+        self.graph_status.config(text="Loading...")
+        first_day, last_day = (start_date - EPOCH).days, (end_date - EPOCH).days
+        self.scheduler.submit("graph", lambda: self.compute_graph(activity_filter, metric, first_day, last_day, granularity, max_points),
+                              lambda result: self.render_graph(result, (first_day, last_day + 1)))
+
+    def compute_graph(self, activity_filter, metric, first_day, last_day, granularity, max_points):
+        # Runs on a worker thread; zooming and panning reuse the pyramid on the Tk thread
+        try:
+            pyramid = self.store.pyramid()
+        except FileNotFoundError:
+            return None, None
+        return pyramid, graph_window(pyramid, activity_filter, metric, first_day, last_day, granularity, max_points)
+
+    def graph_max_points(self):
+        # Two points (a run's low and high) per pixel column of the plot
+        return 2 * max(self.graph_frame.winfo_width(), GRAPH_MIN_WIDTH_PX)
+
+    def on_graph_scroll(self, event):
+        if event.inaxes is not self.graph_ax or self.graph_pyramid is None:
+            return
+        factor = GRAPH_ZOOM_STEP if event.button == "down" else 1 / GRAPH_ZOOM_STEP
+        first, last = self.graph_ax.get_xlim()
+        self.show_graph_window(event.xdata - (event.xdata - first) * factor, event.xdata + (last - event.xdata) * factor)
 
+    def on_graph_press(self, event):
+        if event.button == 1 and event.inaxes is self.graph_ax and self.graph_pyramid is not None:
+            self.graph_drag = (event.x, self.graph_ax.get_xlim())
+
+    def on_graph_drag(self, event):
+        # Pans by the pointer's offset in pixels since the press, which stays valid as the limits move
+        if self.graph_drag is None:
+            return
+        x, (first, last) = self.graph_drag
+        shift = (event.x - x) * (last - first) / self.graph_ax.bbox.width
+        self.show_graph_window(first - shift, last - shift)
+
+    def on_graph_release(self, event):
+        self.graph_drag = None
+
+    def show_graph_window(self, first, last):
+        if not GRAPH_SPAN_DAYS[0] <= last - first <= GRAPH_SPAN_DAYS[1]:
+            return
+        graph = graph_window(self.graph_pyramid, self.activity_var.get(), self.metric_var.get(), int(np.floor(first)), int(np.ceil(last)),
+                             self.granularity_var.get(), self.graph_max_points())
+        self.render_graph((self.graph_pyramid, graph), (first, last))
+        # Keep the entries on the visible range, so changing a dropdown stays where the user zoomed
+        for entry, day in ((self.from_date_entry, first), (self.to_date_entry, last - 1)):
+            entry.delete(0, tk.END)
+            entry.insert(0, (EPOCH + timedelta(days=int(day))).strftime("%d.%m.%Y"))
+
+    def ensure_graph_canvas(self):
+        # The figure, its lines and the Tk canvas are created once and live as long as the Graphs tab
+        # matplotlib is only needed here, so it loads on the first visit to Graphs
+        if self.graph_fig is not None:
+            return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+        self.graph_fig = Figure(figsize=(5, 4))
+        self.graph_ax = self.graph_fig.add_subplot()
+        # x values are epoch days, which matplotlib reads as dates
+        locator = AutoDateLocator()
+        self.graph_ax.xaxis.set_major_locator(locator)
+        self.graph_ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+        self.graph_lines = {act: self.graph_ax.plot([], [], color=color, marker="o", label=act)[0] for act, color in GRAPH_COLORS.items()}
+        self.graph_message = self.graph_ax.text(0.5, 0.5, "No data available", ha="center", va="center", transform=self.graph_ax.transAxes, visible=False)
+        self.graph_state = None
+        self.graph_canvas = FigureCanvasTkAgg(self.graph_fig, master=self.graph_frame)
+        # draw_idle defers the real draw, so time it where it happens
+        self.graph_canvas.draw = SPANS.traced("graph", "draw")(self.graph_canvas.draw)
+        self.graph_canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.graph_hover = GraphHover(self.graph_canvas, self.graph_ax, self.describe_graph_point)
+        self.graph_canvas.mpl_connect("scroll_event", self.on_graph_scroll)
+        self.graph_canvas.mpl_connect("button_press_event", self.on_graph_press)
+        self.graph_canvas.mpl_connect("motion_notify_event", self.on_graph_drag)
+        self.graph_canvas.mpl_connect("button_release_event", self.on_graph_release)
+        self.style_graph()
+        self.current_fig = self.graph_fig
+        self.graph_canvas.draw_idle()
+
+    def style_graph(self):
         theme = self.themes[self.current_theme]
-        fig, ax = plt.subplots(figsize=(5, 4), facecolor=theme["bg"])
+        fig, ax = self.graph_fig, self.graph_ax
+        fig.set_facecolor(theme["bg"])
         ax.set_facecolor(theme["button_bg"])
         ax.tick_params(colors=theme["fg"])
         ax.spines['bottom'].set_color(theme["fg"])
@@ -770,111 +1049,59 @@ class WorkoutTrackerApp:
         ax.spines['left'].set_color(theme["fg"])
         ax.spines['right'].set_color(theme["fg"])
         ax.grid(True, linestyle='--', alpha=0.7, color=theme["fg"])
-
-        try:
-            with open("workouts.csv", "r") as file:
-                reader = csv.reader(file)
-                header = next(reader)
-                workouts = [row for row in reader if len(row) == 8]
-
-            activity_filter = self.activity_var.get()
-            metric = self.metric_var.get()
-            metric_index = {"Distance": 5, "Pace": 6}[metric]
-            unit = {"Distance": "km", "Pace": "min/km" if activity_filter in ["Run", "Walk", "All"] else "min/100m"}[metric]
-
-            try:
-                start_date = datetime.strptime(self.from_date_entry.get() + " 00:00", "%d.%m.%Y %H:%M")
-                end_date = datetime.strptime(self.to_date_entry.get() + " 23:59", "%d.%m.%Y %H:%M")
-                if start_date > end_date:
-                    raise ValueError("Start date must be before end date")
-            except ValueError as e:
-                messagebox.showerror("Error", str(e) if str(e) != "Start date must be before end date" else "Invalid date format (use DD.MM.YYYY)")
-                start_date = datetime.now() - timedelta(days=365)
-                end_date = datetime.now()
-                self.from_date_entry.delete(0, tk.END)
-                self.from_date_entry.insert(0, start_date.strftime("%d.%m.%Y"))
-                self.to_date_entry.delete(0, tk.END)
-                self.to_date_entry.insert(0, end_date.strftime("%d.%m.%Y"))
-
-            months_count = ((end_date.year - start_date.year) * 12 + end_date.month - start_date.month) + 1
-            month_labels = []
-            current_date = start_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            for _ in range(months_count):
-                month_labels.append(current_date.strftime("%b %Y"))
-                next_month = current_date.month + 1 if current_date.month < 12 else 1
-                next_year = current_date.year + 1 if current_date.month == 12 else current_date.year
-                current_date = current_date.replace(month=next_month, year=next_year)
-
-            activities = ["Run", "Swim", "Walk"] if activity_filter == "All" else [activity_filter]
-            colors = {"Run": "#3498DB", "Swim": "#2ECC71", "Walk": "#E74C3C"}
-            monthly_values = {act: {month: 0.0 for month in month_labels} for act in activities}
-            monthly_counts = {act: {month: 0 for month in month_labels} for act in activities}
-
-            for row in workouts:
-                date = row[0].strip('"')
-                exercise = row[1].strip('"')
-                value = row[metric_index].strip('"')
-                if value and exercise in activities:
-                    try:
-                        entry_date = datetime.strptime(date, "%d.%m.%Y %H:%M")
-                        if start_date <= entry_date <= end_date:
-                            month = entry_date.strftime("%b %Y")
-                            if month in month_labels:
-                                if metric == "Pace":
-                                    converted_value = self.parse_pace(value)
-                                else:
-                                    converted_value = float(value) / 1000 if exercise.lower() == "swim" else float(value)
-                                monthly_values[exercise][month] += converted_value
-                                monthly_counts[exercise][month] += 1
-                    except ValueError:
-                        continue
-
-            lines = []
-            for act in activities:
-                values = []
-                for month in month_labels:
-                    if monthly_counts[act][month] > 0:
-                        if metric == "Pace":
-                            avg_value = monthly_values[act][month] / monthly_counts[act][month]
-                            values.append(avg_value)
-                        else:
-                            values.append(monthly_values[act][month])
-                    else:
-                        values.append(0.0)
-                line, = ax.plot(range(len(month_labels)), values, color=colors[act], marker="o", label=act)
-                lines.append(line)
-
-            ax.set_title(f"{metric} Over Time", color=theme["fg"])
-            ax.set_ylabel(f"{metric} ({unit})", color=theme["fg"])
-            ax.set_xticks(range(len(month_labels)))
-            ax.set_xticklabels(month_labels, rotation=45, ha="right")
-            ax.legend()
-
-            cursor = mplcursors.cursor(lines, hover=True)
-            @cursor.connect("add")
-            def on_add(sel):
-                index = int(sel.target[0])
-                act = sel.artist.get_label()
-                value = sel.target[1]
-                month = month_labels[index]
-                if metric == "Pace":
-                    display_value = self.format_pace(value, unit.split()[0])
-                else:
-                    display_value = f"{value:.2f} {unit}"
-                sel.annotation.set_text(f"{act} {month}: {display_value}")
-                sel.annotation.get_bbox_patch().set_facecolor(theme["button_bg"])
-                sel.annotation.get_bbox_patch().set_alpha(0.9)
-
-        except FileNotFoundError:
-            ax.text(0.5, 0.5, "No data available", ha="center", va="center", color=theme["fg"])
-
-        self.current_fig = fig
-        canvas = FigureCanvasTkAgg(fig, master=self.graph_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
+        ax.title.set_color(theme["fg"])
+        ax.yaxis.label.set_color(theme["fg"])
+        self.graph_message.set_color(theme["fg"])
+        self.graph_hover.style(theme["button_bg"], theme["fg"])
+
+    @SPANS.traced("graph", "insert")
+    def render_graph(self, result, limits):
+        self.graph_pyramid, graph = result
+        self.graph_status.config(text="")
+        self.ensure_graph_canvas()
+        ax = self.graph_ax
+        self.graph_state = graph
+        self.graph_message.set_visible(graph is None)
+        series = graph["series"] if graph else {}
+        for act, line in self.graph_lines.items():
+            if act in series:
+                x, values = series[act]
+                line.set_data(x, values)
+                line.set_marker("o" if len(x) <= GRAPH_MARKER_POINTS else "None")
+                line.set_visible(True)
+            else:
+                line.set_data([], [])
+                line.set_visible(False)
+
+        ax.xaxis.set_visible(graph is not None)
+        if graph is not None:
+            metric = graph["metric"]
+            ax.set_title(f"{metric} Over Time ({graph['granularity']})")
+            ax.set_ylabel(f"{metric} ({graph['unit']})")
+            ax.legend(handles=[self.graph_lines[act] for act in series])
+        else:
+            ax.set_title("")
+            ax.set_ylabel("")
+            if ax.get_legend() is not None:
+                ax.get_legend().remove()
+        self.graph_hover.set_series({act: line.get_data() for act, line in self.graph_lines.items() if act in series})
+        ax.relim()
+        ax.autoscale_view(scalex=False)
+        ax.set_xlim(limits)
+        self.graph_canvas.draw_idle()
+
+    def describe_graph_point(self, act, index, value):
+        graph = self.graph_state
+        bucket = bucket_label(graph["granularity"], graph["series"][act][0][index])
+        unit = graph["unit"]
+        if graph["metric"] == "Pace":
+            display_value = format_pace(value, unit.split()[0])
+        else:
+            display_value = f"{value:.2f} {unit}"
+        return f"{act} {bucket}: {display_value}"
 
     def save_graph(self):
-        if hasattr(self, 'current_fig'):
+        if self.current_fig is not None:
             file_path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG files", "*.png")])
             if file_path:
                 self.current_fig.savefig(file_path, dpi=100, bbox_inches="tight")
@@ -907,7 +1134,8 @@ class WorkoutTrackerApp:
         tk.Label(self.input_frame, text="Notes:", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"]).pack(pady=2)
         self.notes_entry = tk.Entry(self.input_frame, font=("Arial", 12), width=20, bg=theme["entry_bg"])
         self.notes_entry.pack(pady=2)
-        tk.Button(self.input_frame, text="Log", command=self.log_activity, font=("Arial", 12), bg="#E74C3C", fg="white", width=10, bd=0, activebackground="#C0392B").pack(pady=10)
+        self.log_button = tk.Button(self.input_frame, text="Log", command=self.log_activity, font=("Arial", 12), bg="#E74C3C", fg="white", width=10, bd=0, activebackground="#C0392B")
+        self.log_button.pack(pady=10)
 
     def show_swim(self):
         self.clear_frame()
@@ -930,7 +1158,8 @@ class WorkoutTrackerApp:
         tk.Label(self.input_frame, text="Notes:", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"]).pack(pady=2)
         self.notes_entry = tk.Entry(self.input_frame, font=("Arial", 12), width=20, bg=theme["entry_bg"])
         self.notes_entry.pack(pady=2)
-        tk.Button(self.input_frame, text="Log", command=self.log_activity, font=("Arial", 12), bg="#E74C3C", fg="white", width=10, bd=0, activebackground="#C0392B").pack(pady=10)
+        self.log_button = tk.Button(self.input_frame, text="Log", command=self.log_activity, font=("Arial", 12), bg="#E74C3C", fg="white", width=10, bd=0, activebackground="#C0392B")
+        self.log_button.pack(pady=10)
 
     def show_walking(self):
         self.clear_frame()
@@ -953,7 +1182,8 @@ class WorkoutTrackerApp:
         tk.Label(self.input_frame, text="Notes:", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"]).pack(pady=2)
         self.notes_entry = tk.Entry(self.input_frame, font=("Arial", 12), width=20, bg=theme["entry_bg"])
         self.notes_entry.pack(pady=2)
-        tk.Button(self.input_frame, text="Log", command=self.log_activity, font=("Arial", 12), bg="#E74C3C", fg="white", width=10, bd=0, activebackground="#C0392B").pack(pady=10)
+        self.log_button = tk.Button(self.input_frame, text="Log", command=self.log_activity, font=("Arial", 12), bg="#E74C3C", fg="white", width=10, bd=0, activebackground="#C0392B")
+        self.log_button.pack(pady=10)
 
     def log_activity(self):
         exercise = self.exercise_entry.get() or self.activity_type
@@ -961,7 +1191,7 @@ class WorkoutTrackerApp:
         notes = self.notes_entry.get()
         
         try:
-            datetime.strptime(date, "%d.%m.%Y %H:%M")
+            parse_timestamp(date)
             if self.activity_type in ["Run", "Walk"]:
                 distance = self.distance_entry.get()
                 pace = self.pace_entry.get()
@@ -979,93 +1209,174 @@ class WorkoutTrackerApp:
                 pace_float = self.parse_pace(pace)
                 row = [date, exercise, "", "", "", distance, pace, notes]
 
-            with open("workouts.csv", "a", newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow(row)
-            
-            messagebox.showinfo("Success", f"Activity logged! Distance: {distance:.2f} {'m' if self.activity_type == 'Swim' else 'km'}")
-            self.clear_frame()
-            if self.current_view == "history":
-                self.update_history()
+            message = f"Activity logged! Distance: {distance:.2f} {'m' if self.activity_type == 'Swim' else 'km'}"
+            self.log_button.config(text="Loading...", state="disabled")
+            self.scheduler.run(lambda: self.store.append(row), lambda record_id: self.activity_logged(message))
         except ValueError as e:
             messagebox.showerror("Error", str(e) if str(e).startswith("Distance") else "Invalid input: Use DD.MM.YYYY HH:MM for date, numeric distance, and MM:SS for pace")
 
+    def activity_logged(self, message):
+        messagebox.showinfo("Success", message)
+        self.clear_frame()
+        self.data_changed()
+
+    @SPANS.traced("history", "update")
     def update_history(self):
-        if self.current_view == "history" and hasattr(self, 'tree'):
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            total_distance_km = 0.0
-            try:
-                with open("workouts.csv", "r") as file:
-                    reader = csv.reader(file)
-                    header = next(reader)
-                    filter_type = self.filter_var.get()
-                    for i, row in enumerate(reader):
-                        if len(row) < 8:
-                            continue
-                        exercise = row[1].strip('"')
-                        if filter_type == "All" or filter_type.lower() in exercise.lower():
-                            tag = "evenrow" if i % 2 == 0 else "oddrow"
-                            distance = float(row[5].strip('"'))
-                            pace = row[6].strip('"')
-                            notes = row[7].strip('"')
-                            dist_unit = "m" if exercise.lower() == "swim" else "km"
-                            pace_unit = "min/100m" if exercise.lower() == "swim" else "min/km"
-                            display_row = [row[0].strip('"'), exercise, f"{distance:.2f} {dist_unit}", f"{pace} {pace_unit}", notes]
-                            self.tree.insert("", "end", values=display_row, tags=(tag,))
-                            total_distance_km += distance / 1000 if exercise.lower() == "swim" else distance
-                    self.stats_label.config(text=f"Total Distance: {total_distance_km:.2f} km")
-            except FileNotFoundError:
-                self.stats_label.config(text="No data available")
+        if hasattr(self, 'tree'):
+            self.stats_label.config(text="Loading...")
+            filter_type = self.filter_var.get()
+            selection = set(self.history_selection)
+            self.scheduler.submit("history", lambda: self.compute_history(filter_type, selection), self.render_history)
+
+    def compute_history(self, filter_type, selection):
+        # Runs on a worker thread
+        return history_view(self.store, filter_type, selection)
+
+    def render_history(self, result):
+        if result is None:
+            self.history_positions = np.empty(0, dtype=np.int64)
+            self.render_history_window()
+            self.stats_label.config(text="No data available")
+            return
+        self.history_columns, self.history_positions, self.history_selection, total_distance_km = result
+        self.history_offset = min(self.history_offset, max(0, len(self.history_positions) - self.history_page_size()))
+        self.render_history_window()
+        self.stats_label.config(text=f"Total Distance: {total_distance_km:.2f} km")
+
+    def history_page_size(self):
+        row_height = self.style.lookup("Treeview", "rowheight") or 20
+        return max(1, self.tree.winfo_height() // int(row_height))
+
+    @SPANS.traced("history", "insert")
+    def render_history_window(self):
+        # Materialize only the rows in view plus a small buffer for partially visible rows
+        if self.current_view != "history" or not hasattr(self, 'history_positions'):
+            return
+        total = len(self.history_positions)
+        page_size = self.history_page_size()
+        self.history_offset = max(0, min(self.history_offset, total - page_size))
+        window = self.history_positions[self.history_offset:self.history_offset + page_size + HISTORY_BUFFER_ROWS]
+        self.history_select_state = None
+        self.tree.delete(*self.tree.get_children())
+        if len(window):
+            record_ids = [str(record_id) for record_id in self.history_columns.id[window].tolist()]
+            # Never waits for the store on the Tk thread: while a load, import or compaction holds
+            # it, a placeholder is shown and the window is rendered again shortly
+            rows = self.store.get_many(record_ids, blocking=False)
+            if rows is None:
+                self.tree.insert("", "end", values=("Loading...",))
+                if self.history_retry is None:
+                    self.history_retry = self.root.after(HISTORY_RETRY_MS, self.retry_history_window)
+            else:
+                for position, record_id, row in zip(window.tolist(), record_ids, rows):
+                    if row is None:  # Deleted since the window was computed
+                        continue
+                    tag = "evenrow" if position % 2 == 0 else "oddrow"
+                    self.tree.insert("", "end", iid=record_id, values=history_display_row(row), tags=(tag,))
+                self.tree.selection_set([record_id for record_id in self.tree.get_children() if record_id in self.history_selection])
+        if total:
+            self.history_scrollbar.set(self.history_offset / total, min(1.0, (self.history_offset + page_size) / total))
+        else:
+            self.history_scrollbar.set(0.0, 1.0)
+
+    def retry_history_window(self):
+        self.history_retry = None
+        self.render_history_window()
+
+    def scroll_history(self, action, amount, unit=None):
+        total = len(self.history_positions)
+        page_size = self.history_page_size()
+        if action == "moveto":
+            offset = int(float(amount) * total)
+        elif unit == "pages":
+            offset = self.history_offset + int(amount) * page_size
+        else:
+            offset = self.history_offset + int(amount)
+        offset = max(0, min(offset, total - page_size))
+        if offset != self.history_offset:
+            self.history_offset = offset
+            self.render_history_window()
+
+    def step_history(self, event, step):
+        self.history_select_state = event.state
+        items = self.tree.get_children()
+        focus = self.tree.focus()
+        if not items or focus not in items:
+            return None
+        index = items.index(focus) + step
+        if 0 <= index < min(len(items), self.history_page_size()):
+            return None  # Let the Treeview move within the window
+        self.scroll_history("scroll", step, "units")
+        items = self.tree.get_children()
+        if focus in items:
+            index = max(0, min(items.index(focus) + step, len(items) - 1))
+        else:
+            index = 0 if step < 0 else min(len(items), self.history_page_size()) - 1
+        if items:
+            self.tree.focus(items[index])
+            self.tree.selection_set(items[index])
+            self.history_selection = {items[index]}
+        return "break"
+
+    def on_history_click(self, event):
+        self.history_select_state = event.state
+
+    def on_history_select(self, event):
+        # Only clicks and arrow keys change the selection; re-rendering the window also fires this event
+        if self.history_select_state is None:
+            return
+        selected = set(self.tree.selection())
+        if self.history_select_state & 0x0005:  # Shift/Control extend the selection beyond the window
+            self.history_selection = (self.history_selection - set(self.tree.get_children())) | selected
+        else:
+            self.history_selection = selected
+        self.history_select_state = None
 
     def delete_records(self):
-        selected_items = self.tree.selection()
+        selected_items = list(self.history_selection)
         if not selected_items:
             messagebox.showwarning("No Selection", "Please select at least one record to delete!")
             return
         
-        selected_values = [self.tree.item(item, "values") for item in selected_items]
-        
-        with open("workouts.csv", "r") as file:
-            reader = csv.reader(file)
-            header = next(reader)
-            all_rows = list(reader)
-        
-        updated_rows = []
-        for row in all_rows:
-            distance = float(row[5].strip('"'))
-            pace = row[6].strip('"')
-            exercise = row[1].strip('"')
-            dist_unit = "m" if exercise.lower() == "swim" else "km"
-            pace_unit = "min/100m" if exercise.lower() == "swim" else "min/km"
-            display_row = (row[0].strip('"'), exercise, f"{distance:.2f} {dist_unit}", f"{pace} {pace_unit}", row[7].strip('"'))
-            if display_row not in selected_values:
-                updated_rows.append(row)
-        
-        with open("workouts.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(header)
-            writer.writerows(updated_rows)
-        
-        self.update_history()
-        messagebox.showinfo("Success", f"{len(selected_items)} record(s) deleted!")
+        self.history_selection = set()
+        self.scheduler.run(lambda: self.store.delete(selected_items), lambda result: self.records_deleted(len(selected_items)))
+
+    def records_deleted(self, count):
+        self.data_changed()
+        messagebox.showinfo("Success", f"{count} record(s) deleted!")
 
     def edit_record(self):
-        selected_item = self.tree.selection()
+        selected_item = list(self.history_selection)
         if not selected_item:
             messagebox.showwarning("No Selection", "Please select a record to edit!")
             return
         if len(selected_item) > 1:
             messagebox.showwarning("Multiple Selection", "Please select only one record to edit!")
             return
-        selected_values = self.tree.item(selected_item[0], "values")
+        status = self.stats_label.cget("text")
+        self.stats_label.config(text="Loading...")
+        record_id = selected_item[0]
+        self.scheduler.submit("edit", lambda: self.fetch_record(record_id), lambda record: self.open_edit_window(record_id, record, status))
+
+    def fetch_record(self, record_id):
+        # Runs on a worker thread
+        try:
+            return self.store.get(record_id)
+        except KeyError:
+            return None
+
+    def open_edit_window(self, record_id, record, status):
+        self.stats_label.config(text=status)
+        if record is None:
+            messagebox.showwarning("No Selection", "The selected record no longer exists!")
+            return
         self.edit_window = tk.Toplevel(self.root)
         self.edit_window.title("Edit Record")
         self.edit_window.geometry("300x350")
         theme = self.themes[self.current_theme]
         self.edit_window.configure(bg=theme["bg"])
         fields = ["Date", "Exercise", "Distance", "Pace", "Notes"]
-        display_values = [selected_values[0], selected_values[1], selected_values[2].split()[0], selected_values[3].split()[0], selected_values[4]]
+        display_values = [record[0], record[1], record[5], record[6], record[7]]
         self.edit_entries = {}
         for i, (field, value) in enumerate(zip(fields, display_values)):
             tk.Label(self.edit_window, text=f"{field}:", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"]).pack(pady=2)
@@ -1073,89 +1384,154 @@ class WorkoutTrackerApp:
             entry.insert(0, value)
             entry.pack(pady=2)
             self.edit_entries[field] = entry
-        tk.Button(self.edit_window, text="Save Changes", command=lambda: self.save_edit(selected_values), font=("Arial", 12), bg="#2ECC71", fg="white", width=15, bd=0, activebackground="#27AE60").pack(pady=10)
+        tk.Button(self.edit_window, text="Save Changes", command=lambda: self.save_edit(record_id), font=("Arial", 12), bg="#2ECC71", fg="white", width=15, bd=0, activebackground="#27AE60").pack(pady=10)
 
-    def save_edit(self, old_values):
+    def save_edit(self, record_id):
         new_values = [self.edit_entries[field].get() for field in ["Date", "Exercise", "Distance", "Pace", "Notes"]]
         try:
-            datetime.strptime(new_values[0], "%d.%m.%Y %H:%M")
+            parse_timestamp(new_values[0])
             float(new_values[2])
             self.parse_pace(new_values[3])
         except ValueError as e:
             messagebox.showerror("Error", "Invalid input: Use DD.MM.YYYY HH:MM for date, numeric distance, and MM:SS for pace")
             return
 
-        with open("workouts.csv", "r") as file:
-            reader = csv.reader(file)
-            header = next(reader)
-            all_rows = list(reader)
-        
-        updated_rows = []
-        for row in all_rows:
-            distance = float(row[5].strip('"'))
-            pace = row[6].strip('"')
-            exercise = row[1].strip('"')
-            dist_unit = "m" if exercise.lower() == "swim" else "km"
-            pace_unit = "min/100m" if exercise.lower() == "swim" else "min/km"
-            display_row = (row[0].strip('"'), exercise, f"{distance:.2f} {dist_unit}", f"{pace} {pace_unit}", row[7].strip('"'))
-            if display_row == old_values:
-                updated_rows.append([new_values[0], new_values[1], "", "", "", new_values[2], new_values[3], new_values[4]])
-            else:
-                updated_rows.append(row)
-        
-        with open("workouts.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(header)
-            writer.writerows(updated_rows)
-        
         self.edit_window.destroy()
-        self.update_history()
+        row = [new_values[0], new_values[1], "", "", "", new_values[2], new_values[3], new_values[4]]
+        self.scheduler.run(lambda: self.update_record(record_id, row), self.record_updated)
+
+    def update_record(self, record_id, row):
+        # Runs on a worker thread; False when the record was deleted before the edit was saved
+        try:
+            self.store.update(record_id, row)
+        except KeyError:
+            return False
+        return True
+
+    def record_updated(self, updated):
+        self.data_changed()
+        if not updated:
+            messagebox.showwarning("Edit Failed", "The record no longer exists!")
+            return
         messagebox.showinfo("Success", "Record updated!")
 
     def export_csv(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
         if file_path:
-            with open("workouts.csv", "r") as source, open(file_path, "w", newline="") as target:
-                target.write(source.read())
-            messagebox.showinfo("Success", "Workouts exported successfully!")
+            self.show_busy("Exporting")
+            backend = self.store.backend
+            self.scheduler.run(lambda: backend.export_workouts(file_path), lambda result: self.busy_done("Workouts exported successfully!"))
 
     def import_csv(self):
         file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
         if file_path:
-            with open(file_path, "r") as source, open("workouts.csv", "a", newline="") as target:
-                reader = csv.reader(source)
-                header = next(reader)
-                for row in reader:
-                    if len(row) == 8:
-                        writer = csv.writer(target)
-                        writer.writerow(row)
-            self.update_history()
-            messagebox.showinfo("Success", "Workouts imported successfully!")
+            theme = self.themes[self.current_theme]
+            self.import_window = tk.Toplevel(self.root, bg=theme["bg"])
+            self.import_window.title("Importing")
+            self.import_window.transient(self.root)
+            self.import_progress_var = tk.DoubleVar(value=0)
+            ttk.Progressbar(self.import_window, variable=self.import_progress_var, maximum=100, length=300).pack(padx=20, pady=(20, 5))
+            self.import_label = tk.Label(self.import_window, text="Reading file...", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"])
+            self.import_label.pack(padx=20, pady=(0, 20))
+            self.scheduler.run(lambda: self.read_import(file_path), self.workouts_imported)
+
+    def read_import(self, file_path):
+        # Runs on a worker thread
+        progress = lambda fraction, imported: self.scheduler.notify(self.import_progressed, fraction, imported)
+        return WorkoutImporter(self.store, progress=progress).run(file_path)
+
+    def import_progressed(self, fraction, imported):
+        if self.import_window is not None and self.import_window.winfo_exists():
+            self.import_progress_var.set(fraction * 100)
+            self.import_label.config(text=f"{imported} workouts imported")
+
+    def workouts_imported(self, summary):
+        if self.import_window is not None and self.import_window.winfo_exists():
+            self.import_window.destroy()
+        self.import_window = None
+        self.data_changed()
+        message = f"Imported {summary['imported']} workouts."
+        if summary["duplicates"]:
+            message += f"\nSkipped {summary['duplicates']} duplicates."
+        if summary["rejected"]:
+            message += f"\nRejected {sum(summary['rejected'].values())} rows:"
+            for reason, count in sorted(summary["rejected"].items()):
+                message += f"\n  {reason}: {count}"
+            message += "\nFirst rejected lines: " + ", ".join(f"{line} ({reason})" for line, reason in summary["examples"])
+        messagebox.showinfo("Import Finished", message)
+
+    def migrate_storage(self):
+        if not messagebox.askyesno("Migrate to SQLite", "Move workouts, goals, plans and profile into workouts.db? The CSV files are kept, use Export CSV to refresh them later."):
+            return
+        self.show_busy("Migrating")
+        self.scheduler.run(migrate_to_sqlite, self.storage_migrated)
+
+    def storage_migrated(self, backend):
+        self.store = WorkoutStore(backend)
+        self.data_changed()
+        self.busy_done("Data migrated to SQLite!")
 
     def backup_data(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")], initialfile="workouts_backup.csv")
         if file_path:
-            shutil.copy("workouts.csv", file_path)
-            messagebox.showinfo("Success", "Data backed up successfully!")
+            self.show_busy("Backing up")
+            backend = self.store.backend
+            self.scheduler.run(lambda: backend.export_workouts(file_path), lambda result: self.busy_done("Data backed up successfully!"))
 
     def restore_data(self):
         file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
         if file_path:
-            shutil.copy(file_path, "workouts.csv")
-            self.update_history()
-            messagebox.showinfo("Success", "Data restored successfully!")
-
-try:
-    with open("workouts.csv", "r") as file:
-        reader = csv.reader(file)
-        header = next(reader)
-        if header != ["date", "exercise", "sets", "reps", "weight", "distance", "pace", "notes"]:
-            raise ValueError("CSV format outdated")
-except (FileNotFoundError, ValueError):
-    with open("workouts.csv", "w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(["date", "exercise", "sets", "reps", "weight", "distance", "pace", "notes"])
-
-root = tk.Tk()
-app = WorkoutTrackerApp(root)
-root.mainloop()
\ No newline at end of file
+            self.show_busy("Restoring")
+            store = self.store
+            self.scheduler.run(lambda: self.restore_workouts(store, file_path), self.data_restored)
+
+    def restore_workouts(self, store, file_path):
+        # Runs on a worker thread
+        if isinstance(store.backend, SqliteBackend):
+            with open(file_path, "r", newline="") as file:
+                reader = csv.reader(file)
+                next(reader, None)
+                store.replace_all([row for row in reader if len(row) in (len(LEGACY_WORKOUT_HEADER), len(WORKOUT_HEADER))])
+        else:
+            store.backend.restore_workouts(file_path)
+
+    def data_restored(self, result):
+        self.data_changed()
+        self.busy_done("Data restored successfully!")
+
+    def show_busy(self, title):
+        # Small window shown while a menu operation runs on the scheduler
+        theme = self.themes[self.current_theme]
+        self.busy_window = tk.Toplevel(self.root, bg=theme["bg"])
+        self.busy_window.title(title)
+        self.busy_window.transient(self.root)
+        tk.Label(self.busy_window, text="Loading...", font=("Arial", 12), fg=theme["fg"], bg=theme["bg"]).pack(padx=40, pady=20)
+
+    def busy_done(self, message):
+        if self.busy_window is not None and self.busy_window.winfo_exists():
+            self.busy_window.destroy()
+        self.busy_window = None
+        messagebox.showinfo("Success", message)
+
+if __name__ == "__main__":
+    try:
+        with open("workouts.csv", "r") as file:
+            reader = csv.reader(file)
+            header = next(reader)
+            if header not in (WORKOUT_HEADER, LEGACY_WORKOUT_HEADER):  # Legacy files get ids on first load
+                raise ValueError("CSV format outdated")
+    except (FileNotFoundError, ValueError):
+        with open("workouts.csv", "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(WORKOUT_HEADER)
+
+    root = tk.Tk()
+    if "--trace" in sys.argv:
+        SPANS.log = True
+        SPANS.enable_memory()
+    app = WorkoutTrackerApp(root)
+    if "--measure-startup" in sys.argv:
+        index = sys.argv.index("--measure-startup")
+        budget = sys.argv[index + 1] if index + 1 < len(sys.argv) else ""
+        sys.exit(app.measure_startup(int(budget) if budget.isdigit() else STARTUP_BUDGET_MS))
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,220 @@
+# Synthetic workout logs and a benchmark of every data path the app uses.
+#   python workout_bench.py generate workouts.csv --rows 1000000
+#   python workout_bench.py run --sizes 10000 100000 1000000 --output bench_results.json
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+from workout_engine import (
+    WORKOUT_HEADER, EPOCH, CsvBackend, WorkoutStore, WorkoutImporter,
+    stats_report, goal_rows, achievements_report, graph_series, history_view, history_display_row,
+)
+
+NOTES = ["", "", "", "Easy", "Intervals", "Long run, felt good", "Hills \"steep\"", "Recovery", "Race day", "Open water", "Pool, 25m", "Café stop ☕"]
+# Per activity: share of rows, distance range (km, m for Swim), pace range in seconds (per km, per 100m for Swim)
+ACTIVITIES = {
+    "Run": (0.5, (3.0, 42.2), (210, 450)),
+    "Walk": (0.3, (1.0, 15.0), (540, 840)),
+    "Swim": (0.2, (200, 4000), (90, 180)),
+}
+GENERATE_CHUNK = 100000
+
+def format_row_pace(seconds, decimal):
+    return f"{seconds / 60:.2f}" if decimal else f"{seconds // 60}:{seconds % 60:02d}"
+
+def generate_rows(count, seed=0, edge_rate=0.001, start=datetime(2015, 1, 1), chunk=GENERATE_CHUNK):
+    # Yields WORKOUT_HEADER rows in date order: a mix of activities, both pace formats, notes with
+    # commas/quotes/unicode, same-day duplicates and a small share of malformed rows
+    rng = np.random.default_rng(seed)
+    names = list(ACTIVITIES)
+    shares = np.array([ACTIVITIES[name][0] for name in names])
+    start_minutes = (start - EPOCH) // timedelta(minutes=1)
+    minute = start_minutes
+    record_id = 1
+    for first in range(0, count, chunk):
+        size = min(chunk, count - first)
+        # About 1.5 workouts a day on average, so long logs span decades like real multi-user exports
+        gaps = rng.exponential(16 * 60, size).astype(np.int64)
+        minutes = minute + np.cumsum(gaps)
+        minute = int(minutes[-1])
+        kinds = rng.choice(len(names), size, p=shares)
+        uniform = rng.random(size)
+        pace_noise = rng.random(size)
+        decimal = rng.random(size) < 0.2
+        notes = rng.integers(0, len(NOTES), size)
+        edge = rng.random(size) < edge_rate
+        edge_kind = rng.integers(0, 4, size)
+        for i in range(size):
+            name = names[kinds[i]]
+            _, (low, high), (pace_low, pace_high) = ACTIVITIES[name]
+            distance = low + (high - low) * uniform[i]
+            distance = f"{distance:.0f}" if name == "Swim" else f"{distance:.2f}"
+            pace = format_row_pace(int(pace_low + (pace_high - pace_low) * pace_noise[i]), decimal[i])
+            date = (EPOCH + timedelta(minutes=int(minutes[i]))).strftime("%d.%m.%Y %H:%M")
+            row = [date, name, "", "", "", distance, pace, NOTES[notes[i]], str(record_id)]
+            if edge[i]:
+                if edge_kind[i] == 0:
+                    row[0] = "31.02." + row[0][6:]  # Impossible date
+                elif edge_kind[i] == 1:
+                    row[5] = "n/a"
+                elif edge_kind[i] == 2:
+                    row[6] = ""
+                else:
+                    row[0] = row[0][1:] if row[0][0] == "0" else row[0]  # Unpadded day
+            record_id += 1
+            yield row
+
+def generate(path, count, seed=0, edge_rate=0.001):
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(WORKOUT_HEADER)
+        batch = []
+        for row in generate_rows(count, seed, edge_rate):
+            batch.append(row)
+            if len(batch) >= GENERATE_CHUNK:
+                writer.writerows(batch)
+                batch = []
+        writer.writerows(batch)
+
+def generate_goals(path, count=200):
+    periods = ["Weekly", "Monthly", "Yearly", "01.01.2020-31.12.2020"]
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        for i in range(count):
+            writer.writerow([list(ACTIVITIES)[i % 3], str(10 + i), periods[i % len(periods)]])
+
+def timed(func, repeat=1):
+    # (first run, best run) in seconds
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times[0], min(times)
+
+def traced_bytes(build):
+    # Python heap still allocated by build() while its result is alive
+    tracemalloc.start()
+    try:
+        kept = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+def loaded_records(data_dir):
+    store = WorkoutStore(CsvBackend(data_dir))
+    store.load()
+    return store.records
+
+def history_page(store):
+    columns, positions, _, _ = history_view(store, "All")
+    page = positions[:40]
+    return [history_display_row(store.records[str(record_id)]) for record_id in columns.id[page].tolist()]
+
+def bench_size(rows, work_dir, repeat, operations):
+    data_dir = os.path.join(work_dir, f"data_{rows}")
+    os.makedirs(data_dir)
+    generate(os.path.join(data_dir, "workouts.csv"), rows)
+    generate_goals(os.path.join(data_dir, "goals.csv"))
+    import_path = os.path.join(work_dir, f"import_{rows}.csv")
+    generate(import_path, max(rows // 10, 1), seed=1)
+    results = []
+
+    def record(case, func, times=1):
+        first, best = timed(func, times)
+        results.append({"rows": rows, "case": case, "first_s": round(first, 6), "best_s": round(best, 6), "runs": times})
+
+    store = WorkoutStore(CsvBackend(data_dir))
+    record("load_csv", lambda: (store.load(), store.columns()))
+    # What the store keeps per workout against the plain lists of strings csv.reader gives
+    for case, build in (("memory_rows", lambda: store.backend.read_workouts()[1]), ("memory_records", lambda: loaded_records(data_dir))):
+        size = traced_bytes(build)
+        results.append({"rows": rows, "case": case, "bytes": size, "bytes_per_row": round(size / rows, 1)})
+    record("load_snapshot", lambda: WorkoutStore(CsvBackend(data_dir)).columns(), repeat)
+    record("history", lambda: history_page(store), repeat)
+    record("stats", lambda: stats_report(store), repeat)
+    record("goals", lambda: goal_rows(store), repeat)
+    record("achievements", lambda: achievements_report(store), repeat)
+    end = EPOCH + timedelta(minutes=int(store.columns().date.max()))
+    record("graph_distance", lambda: graph_series(store, "All", "Distance", end - timedelta(days=365), end), repeat)
+    record("graph_pace", lambda: graph_series(store, "Run", "Pace", end - timedelta(days=365 * 5), end), repeat)
+    record("graph_daily", lambda: graph_series(store, "All", "Distance", end - timedelta(days=365 * 5), end, "Day", 2000), repeat)
+
+    ids = list(store.records)
+    rng = np.random.default_rng(2)
+    edit_ids = [ids[i] for i in rng.choice(len(ids), min(operations, len(ids)), replace=False)]
+    record("edit", lambda: [store.update(record_id, store.records[record_id][:5] + ["5.00", "5:00", "edited"]) for record_id in edit_ids])
+    results[-1]["operations"] = len(edit_ids)
+    record("delete", lambda: [store.delete([record_id]) for record_id in edit_ids])
+    results[-1]["operations"] = len(edit_ids)
+    record("import", lambda: WorkoutImporter(store).run(import_path))
+    results[-1]["operations"] = max(rows // 10, 1)
+    # The first derived-data call after the writes, i.e. what a view pays after an edit
+    record("stats_after_writes", lambda: stats_report(store))
+    shutil.rmtree(data_dir)
+    return results
+
+def code_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(sizes, output, repeat=3, operations=20, work_dir=None):
+    report = {
+        "version": code_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": [],
+    }
+    work_dir = tempfile.mkdtemp(prefix="workout_bench_", dir=work_dir)
+    try:
+        for rows in sizes:
+            results = bench_size(rows, work_dir, repeat, operations)
+            for result in results:
+                if "bytes" in result:
+                    print(f"{result['rows']:>10} {result['case']:<20} {result['bytes'] / 2 ** 20:10.1f} MiB  {result['bytes_per_row']:8.1f} B/row")
+                else:
+                    print(f"{result['rows']:>10} {result['case']:<20} first {result['first_s']:10.4f}s  best {result['best_s']:10.4f}s")
+            report["results"].extend(results)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=1)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic workout logs and benchmark the data paths.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gen = commands.add_parser("generate", help="write a synthetic workouts.csv")
+    gen.add_argument("path")
+    gen.add_argument("--rows", type=int, default=10000)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--edge-rate", type=float, default=0.001, help="share of malformed rows")
+    bench = commands.add_parser("run", help="time loading, views, writes and import at each size")
+    bench.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    bench.add_argument("--output", default="bench_results.json")
+    bench.add_argument("--repeat", type=int, default=3, help="runs of each read-only case (best is reported too)")
+    bench.add_argument("--operations", type=int, default=20, help="edits and deletes timed per size")
+    bench.add_argument("--work-dir", help="where the generated data goes (default: system temp)")
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        generate(args.path, args.rows, args.seed, args.edge_rate)
+    else:
+        run(args.sizes, args.output, args.repeat, args.operations, args.work_dir)
+
+if __name__ == "__main__":
+    main()
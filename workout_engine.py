@@ -0,0 +1,2129 @@
+# Headless part of the workout tracker: storage backends, parsing, aggregation, goals and
+# achievements. workout.py builds the Tk app on top of it; running this module is the batch CLI.
+import argparse
+import csv
+import io
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import bisect
+import json
+import zlib
+import urllib.parse
+import sys
+import time
+import tracemalloc
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+
+LEGACY_WORKOUT_HEADER = ["date", "exercise", "sets", "reps", "weight", "distance", "pace", "notes"]
+WORKOUT_HEADER = LEGACY_WORKOUT_HEADER + ["id"]
+WORKOUT_WIDTHS = (len(LEGACY_WORKOUT_HEADER), len(WORKOUT_HEADER))  # Rows with and without an id
+PROFILE_HEADER = ["Name", "Age", "Weight (kg)", "Height (cm)"]
+GRAPH_COLORS = {"Run": "#3498DB", "Swim": "#2ECC71", "Walk": "#E74C3C"}
+EPOCH = datetime(1970, 1, 1)
+QUERY_CACHE_SIZE = 32
+# The change journal is folded into workouts.csv once it passes this size and this share of the base file
+JOURNAL_COMPACT_BYTES = 64 * 1024
+JOURNAL_COMPACT_SHARE = 0.25
+CHECK_BYTES = 256  # Bytes at the start and before the last read offset compared to tell an append from a rewrite
+GRAPH_GRANULARITIES = ("Day", "Week", "Month", "Year")
+GRAPH_MARKER_POINTS = 120  # Denser lines are drawn without point markers
+GRAPH_PNG_POINTS = 1600  # About two points per pixel column of the 8 in, 100 dpi PNG
+
+class SpanRecorder:
+    # Bounded ring buffer of timing spans: (view, phase, seconds, peak traced bytes, thread).
+    # Timing is always on and cheap; peaks are only collected after enable_memory(), because
+    # tracemalloc slows allocation-heavy code down. The peak of a span covers everything since
+    # the outermost span on its thread started. With log set, spans are also printed to stderr.
+    def __init__(self, capacity=1000):
+        self.spans = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.log = False
+
+    def enable_memory(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, view, phase):
+        depth = getattr(self.local, "depth", 0)
+        tracing = tracemalloc.is_tracing()
+        if tracing and depth == 0:
+            tracemalloc.reset_peak()
+        self.local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.local.depth = depth
+            peak = tracemalloc.get_traced_memory()[1] if tracing else None
+            with self.lock:
+                self.spans.append((view, phase, seconds, peak, threading.current_thread().name))
+            if self.log:
+                memory = f", peak {peak / 1024:.0f} KiB" if peak is not None else ""
+                print(f"[timing] {view}/{phase}: {seconds * 1000:.1f} ms{memory}", file=sys.stderr)
+
+    def traced(self, view, phase):
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(view, phase):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def breakdown(self):
+        # {(view, phase): {"count", "last", "mean", "max", "peak"}} over the spans still buffered
+        with self.lock:
+            spans = list(self.spans)
+        summary = {}
+        for view, phase, seconds, peak, _ in spans:
+            entry = summary.setdefault((view, phase), {"count": 0, "total": 0.0, "last": 0.0, "max": 0.0, "peak": None})
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["last"] = seconds
+            entry["max"] = max(entry["max"], seconds)
+            if peak is not None:
+                entry["peak"] = max(entry["peak"] or 0, peak)
+        for entry in summary.values():
+            entry["mean"] = entry.pop("total") / entry["count"]
+        return summary
+
+SPANS = SpanRecorder()
+
+def parse_pace_seconds(pace_str):
+    pace_str = pace_str.strip('"')  # Rows written by old versions may carry literal quotes
+    if ":" in pace_str:
+        minutes, seconds = map(int, pace_str.split(":"))
+        return minutes * 60 + seconds
+    return round(float(pace_str) * 60)
+
+def parse_distance(text):
+    return float(text.strip('"'))
+
+DAYS_BEFORE_MONTH = np.array([0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334])
+DAYS_IN_MONTH = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def days_from_civil(year, month, day):
+    # Days since 1970-01-01 for a proleptic Gregorian date; works on ints and NumPy arrays alike
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    prior = year - 1
+    return (prior * 365 + prior // 4 - prior // 100 + prior // 400 - 719162
+            + DAYS_BEFORE_MONTH[month] + (leap & (month > 2)) + day - 1)
+
+def parse_timestamp(text):
+    # Epoch minutes of a "DD.MM.YYYY HH:MM" string. The common zero-padded form is sliced
+    # directly; anything else (including literal quotes from old versions) falls back to strptime.
+    # Raises ValueError like strptime.
+    if len(text) == 16 and text[2] == "." and text[5] == "." and text[10] == " " and text[13] == ":":
+        day_text, month_text, year_text, hour_text, minute_text = text[0:2], text[3:5], text[6:10], text[11:13], text[14:16]
+        if (day_text + month_text + year_text + hour_text + minute_text).isdigit():
+            day, month, year, hour, minute = int(day_text), int(month_text), int(year_text), int(hour_text), int(minute_text)
+            if 1 <= month <= 12 and 1 <= day <= DAYS_IN_MONTH[month] and hour < 24 and minute < 60 and year >= 1:
+                if month != 2 or day < 29 or (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
+                    return int(days_from_civil(year, month, day)) * 1440 + hour * 60 + minute
+    return (datetime.strptime(text.strip('"'), "%d.%m.%Y %H:%M") - EPOCH) // timedelta(minutes=1)
+
+def civil_from_days(days):
+    # (year, month, day) of an epoch day; the inverse of days_from_civil for plain ints
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    shifted_month = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * shifted_month + 2) // 5 + 1
+    month = shifted_month + 3 if shifted_month < 10 else shifted_month - 9
+    return year_of_era + era * 400 + (month <= 2), month, day
+
+def format_timestamp(minutes):
+    # "DD.MM.YYYY HH:MM" of epoch minutes; the inverse of parse_timestamp for the zero-padded form
+    days, minute = divmod(minutes, 1440)
+    year, month, day = civil_from_days(days)
+    return f"{day:02d}.{month:02d}.{year:04d} {minute // 60:02d}:{minute % 60:02d}"
+
+def parse_timestamps(texts, exact=False):
+    # Vectorized parse_timestamp for a whole column; unparseable entries become -1. With exact,
+    # also returns which entries are in the zero-padded form that format_timestamp reproduces.
+    texts = list(texts)
+    if not texts:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)) if exact else np.empty(0, dtype=np.int64)
+    codes = np.array(texts, dtype="U17").view(np.uint32).reshape(len(texts), 17).astype(np.int64)
+    digits = codes - ord("0")
+    digit_positions = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15]
+    fast = ((codes[:, 16] == 0) & (codes[:, 2] == ord(".")) & (codes[:, 5] == ord(".")) & (codes[:, 10] == ord(" ")) & (codes[:, 13] == ord(":"))
+            & np.all((digits[:, digit_positions] >= 0) & (digits[:, digit_positions] <= 9), axis=1))
+    day = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 3] * 10 + digits[:, 4]
+    year = digits[:, 6] * 1000 + digits[:, 7] * 100 + digits[:, 8] * 10 + digits[:, 9]
+    hour = digits[:, 11] * 10 + digits[:, 12]
+    minute = digits[:, 14] * 10 + digits[:, 15]
+    fast &= (month >= 1) & (month <= 12) & (year >= 1) & (hour < 24) & (minute < 60) & (day >= 1)
+    month = np.where(fast, month, 1)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    fast &= (day <= DAYS_IN_MONTH[month]) & ((month != 2) | (day < 29) | leap)
+    result = np.where(fast, days_from_civil(year, month, day) * 1440 + hour * 60 + minute, -1)
+    for i in np.flatnonzero(~fast).tolist():
+        try:
+            result[i] = parse_timestamp(texts[i])
+        except ValueError:
+            pass
+    return (result, fast) if exact else result
+
+def parse_workout_values(row):
+    # (epoch minutes, meters, pace seconds) of a workout row, None for fields that don't parse
+    values = [None, None, None]
+    try:
+        values[0] = parse_timestamp(row[0])
+    except ValueError:
+        pass
+    try:
+        distance = parse_distance(row[5])
+        values[1] = distance if row[1].lower() == "swim" else distance * 1000
+    except ValueError:
+        pass
+    try:
+        values[2] = parse_pace_seconds(row[6])
+    except ValueError:
+        pass
+    return values
+
+class WorkoutColumns:
+    # Column-per-field view of the workout rows for vectorized aggregation:
+    # date in epoch minutes, distance in meters, pace in seconds and exercise as a code
+    # into self.exercises. Fields that fail to parse are NaN (distance) or -1 (date, pace).
+    def __init__(self, rows):
+        self.exercises = sorted({row[1] for row in rows})
+        codes = {name: code for code, name in enumerate(self.exercises)}
+        count = len(rows)
+        self.distance = np.full(count, np.nan, dtype=np.float64)
+        self.pace = np.full(count, -1, dtype=np.int64)
+        self.exercise = np.empty(count, dtype=np.int32)
+        self.date = parse_timestamps(row[0] for row in rows)
+        for i, row in enumerate(rows):
+            self.exercise[i] = codes[row[1]]
+            try:
+                distance = parse_distance(row[5])
+                self.distance[i] = distance if row[1].lower() == "swim" else distance * 1000
+            except ValueError:
+                pass
+            try:
+                self.pace[i] = parse_pace_seconds(row[6])
+            except ValueError:
+                pass
+        self.id = np.fromiter((int(row[8]) for row in rows), dtype=np.int64, count=count)
+        self.derive(row[7] for row in rows)
+
+    def derive(self, notes):
+        # Fills in the day/month columns and the notes from the parsed ones
+        self.day = np.where(self.date >= 0, self.date // 1440, -1)
+        self.month = np.where(self.date >= 0, self.months_of(self.date), -1)
+        # Notes as one UTF-8 blob; note i is note_blob[note_offsets[i]:note_offsets[i + 1]]
+        notes = [note.encode("utf-8") for note in notes]
+        self.note_offsets = np.zeros(len(notes) + 1, dtype=np.int64)
+        np.cumsum([len(note) for note in notes], out=self.note_offsets[1:])
+        self.note_blob = np.frombuffer(b"".join(notes), dtype=np.uint8)
+
+    @classmethod
+    def from_arrays(cls, exercises, arrays):
+        columns = cls.__new__(cls)
+        columns.exercises = exercises
+        for name, array in arrays.items():
+            setattr(columns, name, array)
+        return columns
+
+    def note(self, i):
+        return self.note_blob[self.note_offsets[i]:self.note_offsets[i + 1]].tobytes().decode("utf-8")
+
+    def code(self, exercise):
+        try:
+            return self.exercises.index(exercise)
+        except ValueError:
+            return -1
+
+    def activity_mask(self, exercise):
+        return self.exercise == self.code(exercise)
+
+    @staticmethod
+    def to_minutes(date):
+        return (date - EPOCH) // timedelta(minutes=1)
+
+    @staticmethod
+    def to_month(date):
+        return (date.year - 1970) * 12 + date.month - 1
+
+    @staticmethod
+    def month_days(month):
+        # First and last epoch day of an epoch month
+        first = (datetime(1970 + month // 12, month % 12 + 1, 1) - EPOCH).days
+        following = (datetime(1970 + (month + 1) // 12, (month + 1) % 12 + 1, 1) - EPOCH).days
+        return first, following - 1
+
+    @staticmethod
+    def months_of(dates):
+        return (dates // 1440).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+DECIMAL_TEXT = re.compile(r"(?:0|[1-9][0-9]{0,8})(?:\.[0-9]{1,6})?")  # At most 15 digits, which a float keeps exactly
+PACE_TEXT = re.compile(r"([0-9]{1,2}):([0-5][0-9])")
+RECORD_CHUNK = 4096
+RECORD_FIELDS = {"ids": "q", "date": "q", "distance": "d", "distance_decimals": "b", "pace": "d", "pace_decimals": "b", "exercise": "I"}
+
+def is_record_id(text):
+    # Record ids are plain decimal numbers that fit an int64
+    return text.isascii() and text.isdigit() and len(text) < 19 and (text == "0" or text[0] != "0")
+
+def decimal_parts(text):
+    # (value, decimals) of a number that f"{value:.{decimals}f}" prints back as text, None otherwise
+    if not DECIMAL_TEXT.fullmatch(text):
+        return None
+    point = text.find(".")
+    return float(text), len(text) - point - 1 if point >= 0 else 0
+
+# Distances and paces repeat a lot across a log, so their encodings are cached
+@lru_cache(maxsize=8192)
+def encode_distance(text):
+    # (value, decimals, prints back as text) for WorkoutRecords; decimals -1 is an empty distance
+    if not text:
+        return np.nan, -1, True
+    parts = decimal_parts(text)
+    if parts is not None:
+        return parts + (True,)
+    try:
+        return parse_distance(text), -1, False
+    except (ValueError, OverflowError):
+        return np.nan, -1, False
+
+@lru_cache(maxsize=8192)
+def encode_pace(text):
+    # (value, decimals, prints back as text) for WorkoutRecords; decimals -2/-3 are seconds in m:ss/mm:ss
+    match = PACE_TEXT.fullmatch(text)
+    if match:
+        return int(match[1]) * 60 + int(match[2]), -1 - len(match[1]), True
+    if not text:
+        return np.nan, -1, True
+    parts = decimal_parts(text)
+    if parts is not None:
+        return parts + (True,)
+    try:
+        return parse_pace_seconds(text), -2, False
+    except (ValueError, OverflowError):
+        return np.nan, -1, False
+
+class WorkoutRecords(MutableMapping):
+    # The stored workouts: a mapping of record id -> WORKOUT_HEADER row in file order, kept as one
+    # typed array per field instead of a list of nine strings per workout. Rows are rebuilt on
+    # access from the date in epoch minutes, distance and pace as numbers plus their decimals
+    # (-1: empty, -2/-3: pace in seconds written as m:ss/mm:ss) and the exercise as a code into interned names.
+    # Notes are only kept when non-empty, and the few rows that don't print back to exactly their
+    # text (unpadded dates, "n/a" distances, sets/reps/weight) also keep their text in self.texts.
+    # Deleted rows leave holes in the arrays until they make up a quarter of the slots.
+    def __init__(self, rows=(), ids=()):
+        for name, typecode in RECORD_FIELDS.items():
+            setattr(self, name, array(typecode))
+        self.live = bytearray()
+        self.notes = []
+        self.texts = {}
+        self.exercises = []
+        self.exercise_codes = {}
+        # Slots in id order, only kept once ids stop ascending in file order
+        self.order = None
+        self.sorted_ids = None
+        self.count = 0
+        self.extend(rows, ids)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for record_id, live in zip(self.ids, self.live):
+            if live:
+                yield str(record_id)
+
+    def __contains__(self, record_id):
+        return self.slot(record_id) >= 0
+
+    def __getitem__(self, record_id):
+        slot = self.slot(record_id)
+        if slot < 0:
+            raise KeyError(record_id)
+        return self.row(slot)
+
+    def __setitem__(self, record_id, row):
+        slot = self.slot(record_id)
+        if slot < 0:
+            self.extend([row], [record_id])
+            return
+        values, exact = self.encode(row)
+        for name, value in zip(RECORD_FIELDS, (self.ids[slot],) + values):
+            getattr(self, name)[slot] = value
+        self.notes[slot] = row[7] or None
+        if exact:
+            self.texts.pop(self.ids[slot], None)
+        else:
+            self.texts[self.ids[slot]] = tuple(row[:8])
+
+    def __delitem__(self, record_id):
+        slot = self.slot(record_id)
+        if slot < 0:
+            raise KeyError(record_id)
+        self.live[slot] = 0
+        self.notes[slot] = None
+        self.texts.pop(self.ids[slot], None)
+        self.count -= 1
+        if len(self.ids) - self.count > max(len(self.ids) // 4, 1024):
+            self.drop_holes()
+
+    def values(self):
+        # Rows in file order, with the dates of each chunk formatted by NumPy
+        for start in range(0, len(self.ids), RECORD_CHUNK):
+            end = min(start + RECORD_CHUNK, len(self.ids))
+            dates = np.datetime_as_string(np.frombuffer(self.date, dtype=np.int64)[start:end].astype("datetime64[m]")).tolist()
+            for slot, date in zip(range(start, end), dates):
+                if self.live[slot]:
+                    yield self.row(slot, f"{date[8:10]}.{date[5:7]}.{date[:4]} {date[11:]}")
+
+    def copy(self):
+        # An independent copy, e.g. to write the rows out without holding the store lock
+        records = WorkoutRecords()
+        for name, typecode in RECORD_FIELDS.items():
+            setattr(records, name, array(typecode, getattr(self, name)))
+        records.live = bytearray(self.live)
+        records.notes = list(self.notes)
+        records.texts = dict(self.texts)
+        records.exercises = list(self.exercises)
+        records.exercise_codes = dict(self.exercise_codes)
+        if self.order is not None:
+            records.order, records.sorted_ids = array("q", self.order), array("q", self.sorted_ids)
+        records.count = self.count
+        return records
+
+    def find(self, key):
+        # Slot holding an int id, live or not, or -1
+        ids = self.ids if self.order is None else self.sorted_ids
+        i = bisect.bisect_left(ids, key)
+        if i == len(ids) or ids[i] != key:
+            return -1
+        return i if self.order is None else self.order[i]
+
+    def slot(self, record_id):
+        # Slot of a live record, or -1
+        if not isinstance(record_id, str) or not is_record_id(record_id):
+            return -1
+        slot = self.find(int(record_id))
+        return slot if slot >= 0 and self.live[slot] else -1
+
+    def row(self, slot, date=None):
+        # date: the formatted date when already known
+        record_id = self.ids[slot]
+        text = self.texts.get(record_id)
+        if text is not None:
+            return list(text) + [str(record_id)]
+        distance, distance_decimals = self.distance[slot], self.distance_decimals[slot]
+        pace, pace_decimals = self.pace[slot], self.pace_decimals[slot]
+        if pace_decimals <= -2:
+            pace = f"{int(pace) // 60:0{-1 - pace_decimals}d}:{int(pace) % 60:02d}"
+        else:
+            pace = f"{pace:.{pace_decimals}f}" if pace_decimals >= 0 else ""
+        return [date or format_timestamp(self.date[slot]), self.exercises[self.exercise[slot]], "", "", "",
+                f"{distance:.{distance_decimals}f}" if distance_decimals >= 0 else "", pace, self.notes[slot] or "", str(record_id)]
+
+    def extend(self, rows, ids):
+        # Appends rows under new ids, with the dates parsed in one vectorized pass
+        rows = list(rows)
+        keys = [int(record_id) for record_id in ids]
+        if self.count < len(self.ids) and any(self.find(key) >= 0 for key in keys):
+            self.drop_holes()  # An id that was deleted comes back; it goes to the end like in a dict
+        first = len(self.ids)
+        minutes, exact = parse_timestamps((row[0] for row in rows), exact=True)
+        # One flat list of numbers rather than a tuple per row, which would keep the GC busy
+        fields, shared = [], {}
+        for row, key, minute, is_exact in zip(rows, keys, minutes.tolist(), exact.tolist()):
+            values, exact = self.encode(row, minute if is_exact else None)
+            fields.append(key)
+            fields.extend(values)
+            # Repeated notes within one batch share a string
+            note = row[7] or None
+            self.notes.append(note and shared.setdefault(note, note))
+            if not exact:
+                self.texts[key] = tuple(row[:8])
+        for i, name in enumerate(RECORD_FIELDS):
+            getattr(self, name).extend(fields[i::len(RECORD_FIELDS)])
+        self.live.extend(b"\x01" * len(keys))
+        self.count += len(keys)
+        self.index(first)
+
+    def encode(self, row, minutes=None):
+        # Values of the RECORD_FIELDS after the id, and whether they print back to exactly the
+        # text of row; minutes is the date when already known to print back as row[0]
+        exact = not (row[2] or row[3] or row[4])
+        if minutes is None:
+            try:
+                minutes = parse_timestamp(row[0])
+                exact = exact and format_timestamp(minutes) == row[0]
+            except ValueError:
+                minutes, exact = -1, False
+        distance, distance_decimals, distance_exact = encode_distance(row[5])
+        pace, pace_decimals, pace_exact = encode_pace(row[6])
+        code = self.exercise_codes.get(row[1])
+        if code is None:
+            code = self.exercise_codes[row[1]] = len(self.exercises)
+            self.exercises.append(sys.intern(row[1]))
+        return (minutes, distance, distance_decimals, pace, pace_decimals, code), exact and distance_exact and pace_exact
+
+    def index(self, first):
+        # Keeps the slots findable by id after slots first.. were added: a binary search over
+        # self.ids while ids ascend in file order, over a sorted copy once they don't
+        ids = np.frombuffer(self.ids, dtype=np.int64)
+        added = ids[first:]
+        ascending = len(added) == 0 or bool(np.all(added[1:] > added[:-1]))
+        if ascending and self.order is None and (first == 0 or len(added) == 0 or added[0] > ids[first - 1]):
+            return
+        if ascending and self.order is not None and (len(added) == 0 or added[0] > self.sorted_ids[-1]):
+            self.order.extend(range(first, len(ids)))
+            self.sorted_ids.frombytes(added.tobytes())
+            return
+        order = np.argsort(ids, kind="stable")
+        self.order, self.sorted_ids = array("q", order.tobytes()), array("q", ids[order].tobytes())
+
+    def drop_holes(self):
+        live = np.frombuffer(self.live, dtype=bool)
+        for name, typecode in RECORD_FIELDS.items():
+            setattr(self, name, array(typecode, np.frombuffer(getattr(self, name), dtype=typecode)[live].tobytes()))
+        self.notes = [note for note, alive in zip(self.notes, self.live) if alive]
+        self.live = bytearray(b"\x01") * self.count
+        self.order = self.sorted_ids = None
+        self.index(0)
+
+    def columns(self):
+        # WorkoutColumns straight from the arrays, without formatting or parsing any text
+        live = np.frombuffer(self.live, dtype=bool)
+        codes = np.frombuffer(self.exercise, dtype=np.uint32)[live]
+        used = np.unique(codes).tolist()
+        columns = WorkoutColumns.__new__(WorkoutColumns)
+        columns.exercises = sorted(self.exercises[code] for code in used)
+        remap = np.zeros(len(self.exercises), dtype=np.int32)
+        for code in used:
+            remap[code] = columns.exercises.index(self.exercises[code])
+        columns.exercise = remap[codes]
+        swim = np.array([name.lower() == "swim" for name in self.exercises], dtype=bool)[codes]
+        distance = np.frombuffer(self.distance, dtype=np.float64)[live]
+        columns.distance = np.where(swim, distance, distance * 1000)
+        pace = np.frombuffer(self.pace, dtype=np.float64)[live]
+        pace = np.where(np.frombuffer(self.pace_decimals, dtype=np.int8)[live] <= -2, pace, np.round(pace * 60))
+        columns.pace = np.where(np.isnan(pace), -1, pace).astype(np.int64)
+        columns.date = np.frombuffer(self.date, dtype=np.int64)[live]
+        columns.id = np.frombuffer(self.ids, dtype=np.int64)[live]
+        columns.derive(note or "" for note, alive in zip(self.notes, self.live) if alive)
+        return columns
+
+class WorkoutSnapshot:
+    # Binary copy of WorkoutColumns kept next to workouts.csv and opened with numpy.memmap, so a
+    # cold start maps the parsed columns instead of parsing the text again. Layout: magic, header
+    # length, JSON header, then each array 8-byte aligned. Only valid while the backend signature
+    # (size and mtime of the CSV and its journal) and their CRC-32 match the header; otherwise the
+    # store rebuilds it from the records.
+    MAGIC = b"WKSNAP02"
+    ARRAYS = (("date", np.int64), ("distance", np.float64), ("pace", np.int64), ("exercise", np.int32), ("id", np.int64),
+              ("day", np.int64), ("month", np.int64), ("note_offsets", np.int64), ("note_blob", np.uint8))
+
+    def __init__(self, path, source_paths):
+        self.path = path
+        self.source_paths = source_paths
+        self.verified = None
+
+    def checksum(self):
+        crc = 0
+        for source_path in self.source_paths:
+            try:
+                with open(source_path, "rb") as file:
+                    for block in iter(lambda: file.read(1 << 20), b""):
+                        crc = zlib.crc32(block, crc)
+            except FileNotFoundError:
+                pass
+        return crc
+
+    def read_header(self):
+        with open(self.path, "rb") as file:
+            if file.read(len(self.MAGIC)) != self.MAGIC:
+                return None, 0
+            length = int.from_bytes(file.read(8), "little")
+            header = json.loads(file.read(length))
+        return header, -(-(len(self.MAGIC) + 8 + length) // 8) * 8
+
+    def matches(self, signature):
+        if signature is None:
+            return False
+        if signature == self.verified:
+            return True
+        try:
+            header, _ = self.read_header()
+            valid = header is not None and tuple(header["signature"]) == tuple(signature) and header["crc32"] == self.checksum()
+        except (OSError, ValueError, KeyError):
+            return False
+        if valid:
+            self.verified = signature
+        return valid
+
+    def load(self, signature):
+        if not self.matches(signature):
+            return None
+        try:
+            header, data_offset = self.read_header()
+            arrays = {}
+            for name, dtype in self.ARRAYS:
+                offset, count = header["arrays"][name]
+                if count:
+                    arrays[name] = np.memmap(self.path, dtype=dtype, mode="r", offset=data_offset + offset, shape=(count,))
+                else:
+                    arrays[name] = np.empty(0, dtype=dtype)
+        except (OSError, ValueError, KeyError):
+            self.verified = None
+            return None
+        return WorkoutColumns.from_arrays(header["exercises"], arrays)
+
+    def save(self, columns, signature):
+        if signature is None:
+            return
+        arrays = [(name, np.ascontiguousarray(getattr(columns, name), dtype=dtype)) for name, dtype in self.ARRAYS]
+        layout = {}
+        offset = 0
+        for name, array in arrays:
+            layout[name] = [offset, len(array)]
+            offset = -(-(offset + array.nbytes) // 8) * 8
+        try:
+            header = json.dumps({"signature": list(signature), "crc32": self.checksum(),
+                                 "exercises": columns.exercises, "arrays": layout}).encode("utf-8")
+            data_offset = -(-(len(self.MAGIC) + 8 + len(header)) // 8) * 8
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "wb") as file:
+                file.write(self.MAGIC + len(header).to_bytes(8, "little") + header)
+                for name, array in arrays:
+                    file.seek(data_offset + layout[name][0])
+                    file.write(array.tobytes())
+            os.replace(temp_path, self.path)
+            self.verified = signature
+        except OSError:
+            pass  # The snapshot is only a cache
+
+class WorkoutRollups:
+    # Per-activity totals for each day, week (Monday based) and month, keyed by epoch day,
+    # epoch week and epoch month. Each bucket is [meters, distance count, pace seconds, pace count].
+    # Kept up to date incrementally by the store and persisted next to the data.
+    LEVELS = ("day", "week", "month")
+
+    def __init__(self, path):
+        self.path = path
+        self.buckets = {}
+
+    @staticmethod
+    def keys_for(minutes):
+        day = minutes // 1440
+        date = EPOCH + timedelta(days=day)
+        return {"day": day, "week": (day + 3) // 7, "month": WorkoutColumns.to_month(date)}
+
+    def level(self, activity, level):
+        return self.buckets.get((activity, level), {})
+
+    def rebuild(self, columns):
+        self.buckets = {}
+        dated = columns.date >= 0
+        keys = {"day": columns.day, "week": (columns.day + 3) // 7, "month": columns.month}
+        has_distance = ~np.isnan(columns.distance)
+        has_pace = columns.pace >= 0
+        for code, activity in enumerate(columns.exercises):
+            mask = dated & (columns.exercise == code)
+            if not mask.any():
+                continue
+            for level in self.LEVELS:
+                unique, inverse = np.unique(keys[level][mask], return_inverse=True)
+                distance = np.bincount(inverse, weights=np.where(has_distance[mask], columns.distance[mask], 0.0), minlength=len(unique))
+                distance_count = np.bincount(inverse, weights=has_distance[mask], minlength=len(unique))
+                pace = np.bincount(inverse, weights=np.where(has_pace[mask], columns.pace[mask], 0), minlength=len(unique))
+                pace_count = np.bincount(inverse, weights=has_pace[mask], minlength=len(unique))
+                self.buckets[(activity, level)] = {
+                    int(key): [float(distance[i]), int(distance_count[i]), float(pace[i]), int(pace_count[i])]
+                    for i, key in enumerate(unique.tolist())
+                }
+
+    def apply(self, row, sign):
+        minutes, meters, pace = parse_workout_values(row)
+        if minutes is None:
+            return
+        for level, key in self.keys_for(minutes).items():
+            buckets = self.buckets.setdefault((row[1], level), {})
+            bucket = buckets.setdefault(key, [0.0, 0, 0.0, 0])
+            if meters is not None:
+                bucket[0] += sign * meters
+                bucket[1] += sign
+            if pace is not None:
+                bucket[2] += sign * pace
+                bucket[3] += sign
+            if bucket[1] <= 0 and bucket[3] <= 0:
+                del buckets[key]
+
+    def add(self, row):
+        self.apply(row, 1)
+
+    def remove(self, row):
+        self.apply(row, -1)
+
+    def load(self, fingerprint):
+        # Returns False when the file is missing or was written for different data
+        try:
+            with open(self.path, "r", newline="") as file:
+                reader = csv.reader(file)
+                if next(reader, None) != ["fingerprint"] + fingerprint:
+                    return False
+                buckets = {}
+                for activity, level, key, distance, distance_count, pace, pace_count in reader:
+                    buckets.setdefault((activity, level), {})[int(key)] = [float(distance), int(distance_count), float(pace), int(pace_count)]
+        except (FileNotFoundError, ValueError):
+            return False
+        self.buckets = buckets
+        return True
+
+    def save(self, fingerprint):
+        with open(self.path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["fingerprint"] + fingerprint)
+            for (activity, level), buckets in self.buckets.items():
+                writer.writerows([activity, level, key] + bucket for key, bucket in buckets.items())
+
+class StreakTracker:
+    # Distinct active days per activity (None = any activity) and the runs of consecutive days
+    # they form. Days are counted, so a second workout on a day neither breaks nor extends a run,
+    # and removing one of them keeps the day active. Only workouts with date, distance and pace count.
+    def __init__(self):
+        self.days = {}
+        self.starts = {}
+        self.ends = {}
+        self.lengths = {}
+
+    @staticmethod
+    def counted(row):
+        return None not in parse_workout_values(row)
+
+    def rebuild(self, columns):
+        self.__init__()
+        complete = (columns.date >= 0) & ~np.isnan(columns.distance) & (columns.pace >= 0)
+        keys = [(None, complete)] + [(activity, complete & (columns.exercise == code)) for code, activity in enumerate(columns.exercises)]
+        for key, mask in keys:
+            days, counts = np.unique(columns.day[mask], return_counts=True)
+            if not len(days):
+                continue
+            breaks = np.flatnonzero(np.diff(days) != 1)
+            starts = days[np.concatenate(([0], breaks + 1))].tolist()
+            ends = days[np.concatenate((breaks, [len(days) - 1]))].tolist()
+            self.days[key] = dict(zip(days.tolist(), counts.tolist()))
+            self.starts[key] = starts
+            self.ends[key] = dict(zip(starts, ends))
+            self.lengths[key] = {}
+            for start, end in zip(starts, ends):
+                self.count_run(key, end - start + 1, 1)
+
+    def count_run(self, key, length, sign):
+        lengths = self.lengths.setdefault(key, {})
+        lengths[length] = lengths.get(length, 0) + sign
+        if not lengths[length]:
+            del lengths[length]
+
+    def run_of(self, key, day):
+        # Start of the run containing day, or None
+        starts = self.starts.get(key, [])
+        i = bisect.bisect_right(starts, day) - 1
+        if i >= 0 and self.ends[key][starts[i]] >= day:
+            return starts[i]
+        return None
+
+    def add(self, row):
+        if self.counted(row):
+            day = parse_timestamp(row[0]) // 1440
+            for key in (None, row[1]):
+                self.add_day(key, day)
+
+    def remove(self, row):
+        if self.counted(row):
+            day = parse_timestamp(row[0]) // 1440
+            for key in (None, row[1]):
+                self.remove_day(key, day)
+
+    def add_day(self, key, day):
+        days = self.days.setdefault(key, {})
+        days[day] = days.get(day, 0) + 1
+        if days[day] > 1:
+            return
+        starts, ends = self.starts.setdefault(key, []), self.ends.setdefault(key, {})
+        start = end = day
+        before = self.run_of(key, day - 1)
+        if before is not None:
+            start = before
+            self.count_run(key, ends[before] - before + 1, -1)
+        if day + 1 in ends:
+            end = ends.pop(day + 1)
+            starts.pop(bisect.bisect_left(starts, day + 1))
+            self.count_run(key, end - day, -1)
+        if before is None:
+            bisect.insort(starts, start)
+        ends[start] = end
+        self.count_run(key, end - start + 1, 1)
+
+    def remove_day(self, key, day):
+        days = self.days.get(key, {})
+        if day not in days:
+            return
+        days[day] -= 1
+        if days[day]:
+            return
+        del days[day]
+        starts, ends = self.starts[key], self.ends[key]
+        start = self.run_of(key, day)
+        end = ends.pop(start)
+        starts.pop(bisect.bisect_left(starts, start))
+        self.count_run(key, end - start + 1, -1)
+        for first, last in ((start, day - 1), (day + 1, end)):
+            if first <= last:
+                bisect.insort(starts, first)
+                ends[first] = last
+                self.count_run(key, last - first + 1, 1)
+
+    def longest(self, activity=None):
+        return max(self.lengths.get(activity, {}), default=0)
+
+    def current(self, today, activity=None):
+        # Length of the run ending today, or yesterday when today has no workout yet
+        for day in (today, today - 1):
+            start = self.run_of(activity, day)
+            if start is not None and self.ends[activity][start] == day:
+                return day - start + 1
+        return 0
+
+def goal_range(period, now):
+    # [start, end) in epoch minutes covered by a goal period. Weekly is the last seven days up to
+    # the minute, Monthly and Yearly start at the calendar month/year, and both include
+    # future-dated workouts. "DD.MM.YYYY-DD.MM.YYYY" is a custom range, inclusive of both days.
+    if period == "Weekly":
+        return -(-(now - timedelta(days=7) - EPOCH) // timedelta(minutes=1)), GoalIndex.OPEN_END
+    if period == "Monthly":
+        return WorkoutColumns.to_minutes(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)), GoalIndex.OPEN_END
+    if period == "Yearly":
+        return WorkoutColumns.to_minutes(datetime(now.year, 1, 1)), GoalIndex.OPEN_END
+    first, separator, last = period.partition("-")
+    if not separator:
+        raise ValueError(f"Unknown goal period: {period}")
+    return parse_timestamp(first.strip() + " 00:00"), parse_timestamp(last.strip() + " 00:00") + 1440
+
+class GoalIndex:
+    # Per-activity workout dates in sorted order with cumulative distance (meters), so the
+    # distance inside any date range is two binary searches and a subtraction.
+    OPEN_END = np.iinfo(np.int64).max
+
+    def __init__(self, columns):
+        self.activities = {}
+        valid = columns.date >= 0
+        for code, exercise in enumerate(columns.exercises):
+            mask = valid & (columns.exercise == code)
+            dates = columns.date[mask]
+            order = np.argsort(dates, kind="stable")
+            meters = np.nan_to_num(columns.distance[mask][order])
+            self.activities[exercise] = (dates[order], np.concatenate(([0.0], np.cumsum(meters))))
+
+    def total(self, activity, start, end):
+        # Meters of activity with start <= date < end (epoch minutes)
+        if activity not in self.activities:
+            return 0.0
+        dates, cumulative = self.activities[activity]
+        return float(cumulative[np.searchsorted(dates, end, "left")] - cumulative[np.searchsorted(dates, start, "left")])
+
+class CsvBackend:
+    # Default storage: the plain CSV files in the data directory. New workouts are appended to
+    # workouts.csv; edits and deletes are appended to workouts_journal.csv as "put" (full row) and
+    # "del" (id) entries that are replayed on read, until compaction folds them into a new base.
+    # Replaying is idempotent, so a crash between installing a new base and dropping the journal is harmless.
+    # The journal starts with a "base" line (size and CRCs of the first and last bytes of workouts.csv
+    # when it was started); it is ignored once that base was replaced or rewritten, and restarted by the next edit.
+    supports_range_queries = False
+    supports_snapshot = True
+    supports_journal = True
+    supports_tail = True
+
+    def __init__(self, directory="."):
+        self.directory = directory
+        self.workouts_path = os.path.join(directory, "workouts.csv")
+        self.journal_path = os.path.join(directory, "workouts_journal.csv")
+        self.goals_path = os.path.join(directory, "goals.csv")
+        self.plans_path = os.path.join(directory, "plans.csv")
+        self.profile_path = os.path.join(directory, "profile.csv")
+
+    def signature(self):
+        try:
+            stat = os.stat(self.workouts_path)
+        except FileNotFoundError:
+            return None
+        try:
+            journal = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return (stat.st_size, stat.st_mtime_ns)
+        return (stat.st_size, stat.st_mtime_ns, journal.st_size, journal.st_mtime_ns)
+
+    def fingerprint(self):
+        # Persistent identity of the stored workouts, used to validate derived files like rollups
+        signature = self.signature()
+        return [str(part) for part in signature] if signature else None
+
+    def journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def base_mark(self, size=None):
+        # Identity of workouts.csv up to size (default: all of it); appends after size don't change it
+        with open(self.workouts_path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            size = stat.st_size if size is None else size
+            if size > stat.st_size:
+                return None
+            head = file.read(min(CHECK_BYTES, size))
+            file.seek(max(size - CHECK_BYTES, 0))
+            tail = file.read(size - max(size - CHECK_BYTES, 0))
+        return ["base", str(size), str(zlib.crc32(head)), str(zlib.crc32(tail))]
+
+    def journal_current(self, header):
+        # Was the journal with this first line written against the current workouts.csv?
+        if len(header) != 4 or header[0] != "base" or not header[1].isdigit():
+            return False
+        try:
+            return self.base_mark(int(header[1])) == header
+        except FileNotFoundError:
+            return False
+
+    def read_workouts(self):
+        with open(self.workouts_path, "r", newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader, WORKOUT_HEADER)
+            # Rows without an id (legacy files, or appended by older versions) are kept and given one by load
+            rows = [row for row in reader if len(row) in WORKOUT_WIDTHS]
+        return header, self.replay(rows)
+
+    def position(self):
+        # (file identity, offset, first bytes, bytes before the offset) at the end of workouts.csv, for read_appended
+        with open(self.workouts_path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            head = file.read(CHECK_BYTES)
+            file.seek(max(stat.st_size - CHECK_BYTES, 0))
+            return (stat.st_dev, stat.st_ino), stat.st_size, head, file.read()
+
+    def read_appended(self, position):
+        # Complete rows appended to workouts.csv since an earlier position, and the position after
+        # them; None when the file was replaced, truncated or rewritten and has to be read in full.
+        # Rewrites are recognized by a new inode or changed bytes at either end of the old contents,
+        # so an in-place edit confined to the middle of a file that also grew passes for an append.
+        identity, offset, head, before = position
+        with open(self.workouts_path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            if (stat.st_dev, stat.st_ino) != identity or stat.st_size < offset or file.read(len(head)) != head:
+                return None
+            file.seek(offset - len(before))
+            if file.read(len(before)) != before:
+                return None
+            data = file.read()
+        end = data.rfind(b"\n") + 1  # A partly written last row is left for the next read
+        try:
+            text = data[:end].decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        rows = [row for row in csv.reader(io.StringIO(text, newline="")) if len(row) in WORKOUT_WIDTHS]
+        return rows, (identity, offset + end, head, (before + data[:end])[-CHECK_BYTES:])
+
+    def replay(self, rows):
+        try:
+            with open(self.journal_path, "r", newline="") as file:
+                journal = list(csv.reader(file))
+        except FileNotFoundError:
+            return rows
+        if not journal or not self.journal_current(journal[0]):
+            return rows  # Edits to a workouts.csv that is gone; they must not be applied to this one
+        positions = {row[8]: i for i, row in enumerate(rows) if len(row) == len(WORKOUT_HEADER)}
+        for entry in journal[1:]:
+            if entry and entry[0] == "put" and len(entry) == len(WORKOUT_HEADER) + 1:
+                # A put only ever edits a row of the base; one for an unknown id is stale and dropped
+                i = positions.get(entry[-1])
+                if i is not None:
+                    rows[i] = entry[1:]
+            elif entry and entry[0] == "del" and len(entry) == 2:
+                i = positions.pop(entry[1], None)
+                if i is not None:
+                    rows[i] = None
+        return [row for row in rows if row is not None]
+
+    def write_base(self, rows):
+        # Writes a complete workouts file next to the real one and returns its path
+        temp_path = self.workouts_path + ".tmp"
+        with open(temp_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(WORKOUT_HEADER)
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        return temp_path
+
+    def install_base(self, temp_path, journal_offset=None):
+        # Renames a file from write_base over workouts.csv and drops the journal entries it contains:
+        # all of them, or those before journal_offset when more were appended while it was written
+        os.replace(temp_path, self.workouts_path)
+        if journal_offset is not None and self.journal_size() > journal_offset:
+            with open(self.journal_path, "rb") as file:
+                file.seek(journal_offset)
+                tail = file.read()
+            with open(self.journal_path + ".tmp", "w", newline="") as file:
+                csv.writer(file).writerow(self.base_mark())
+            with open(self.journal_path + ".tmp", "ab") as file:
+                file.write(tail)
+            os.replace(self.journal_path + ".tmp", self.journal_path)
+        elif os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def write_workouts(self, rows):
+        self.install_base(self.write_base(rows))
+
+    def append_workouts(self, rows):
+        with open(self.workouts_path, "a", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerows(rows)
+
+    def journal_header(self):
+        try:
+            with open(self.journal_path, "r", newline="") as file:
+                return next(csv.reader(file), [])
+        except FileNotFoundError:
+            return []
+
+    def append_journal(self, entries):
+        # A missing or stale journal is started over against the current workouts.csv
+        current = self.journal_current(self.journal_header())
+        with open(self.journal_path, "a" if current else "w", newline="") as file:
+            writer = csv.writer(file)
+            if not current:
+                writer.writerow(self.base_mark())
+            writer.writerows(entries)
+
+    def update_workout(self, row, records):
+        self.append_journal([["put"] + row])
+
+    def delete_workouts(self, record_ids, records):
+        self.append_journal([["del", record_id] for record_id in record_ids])
+
+    def restore_workouts(self, file_path):
+        shutil.copy(file_path, self.workouts_path + ".tmp")
+        self.install_base(self.workouts_path + ".tmp")
+
+    def export_workouts(self, file_path):
+        if not os.path.exists(self.journal_path):
+            shutil.copy(self.workouts_path, file_path)
+            return
+        header, rows = self.read_workouts()
+        with open(file_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def read_rows(self, path):
+        try:
+            with open(path, "r", newline="") as file:
+                return list(csv.reader(file))
+        except FileNotFoundError:
+            return []
+
+    def write_rows(self, path, rows):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerows(rows)
+
+    def append_row(self, path, row):
+        with open(path, "a", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(row)
+
+    def read_goals(self):
+        return self.read_rows(self.goals_path)
+
+    def write_goals(self, rows):
+        self.write_rows(self.goals_path, rows)
+
+    def append_goal(self, row):
+        self.append_row(self.goals_path, row)
+
+    def read_plans(self):
+        return self.read_rows(self.plans_path)
+
+    def write_plans(self, rows):
+        self.write_rows(self.plans_path, rows)
+
+    def append_plan(self, row):
+        self.append_row(self.plans_path, row)
+
+    def read_profile(self):
+        rows = self.read_rows(self.profile_path)
+        return rows[1] if len(rows) > 1 else [""] * len(PROFILE_HEADER)
+
+    def write_profile(self, values):
+        self.write_rows(self.profile_path, [PROFILE_HEADER, values])
+
+class SqliteBackend:
+    # Optional storage in workouts.db. Parsed date/meters/pace columns are stored next to the
+    # original text, so date-range totals are range scans over the (exercise, minutes) index and the
+    # fingerprint can be computed without reading the rows.
+    supports_range_queries = True
+    supports_snapshot = False
+    supports_journal = False
+    supports_tail = False
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS workouts (
+            id INTEGER PRIMARY KEY, date TEXT NOT NULL, exercise TEXT NOT NULL, sets TEXT, reps TEXT,
+            weight TEXT, distance TEXT, pace TEXT, notes TEXT, minutes INTEGER, meters REAL, pace_seconds INTEGER);
+        CREATE INDEX IF NOT EXISTS workouts_exercise_minutes ON workouts (exercise, minutes);
+        CREATE TABLE IF NOT EXISTS goals (position INTEGER PRIMARY KEY, activity TEXT, target TEXT, period TEXT);
+        CREATE TABLE IF NOT EXISTS plans (position INTEGER PRIMARY KEY, day TEXT, activity TEXT, distance TEXT, done TEXT);
+        CREATE TABLE IF NOT EXISTS profile (name TEXT, age TEXT, weight TEXT, height TEXT);
+    """
+
+    def __init__(self, directory=".", read_only=False):
+        self.directory = directory
+        self.path = os.path.join(directory, "workouts.db")
+        self.lock = threading.RLock()
+        # One connection shared by the UI and worker threads, serialized by self.lock
+        if read_only:
+            uri = "file:" + urllib.parse.quote(os.path.abspath(self.path)) + "?mode=ro"
+            # Without a live WAL file nobody is writing; immutable keeps SQLite from creating -shm/-wal here
+            if not os.path.exists(self.path + "-wal"):
+                uri += "&immutable=1"
+            self.connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def signature(self):
+        # data_version only changes for commits made by other connections
+        with self.lock:
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def fingerprint(self):
+        with self.lock:
+            # Per exercise, so moving a workout to another activity also invalidates the rollups
+            rows = self.connection.execute(
+                "SELECT exercise, count(*), max(id), total(minutes), total(meters), total(pace_seconds) FROM workouts GROUP BY exercise ORDER BY exercise").fetchall()
+        return [str(part) for row in rows for part in row]
+
+    @staticmethod
+    def workout_params(row):
+        return [int(row[8])] + row[:8] + parse_workout_values(row)
+
+    def read_workouts(self):
+        with self.lock:
+            cursor = self.connection.execute("SELECT date, exercise, sets, reps, weight, distance, pace, notes, id FROM workouts ORDER BY id")
+            return WORKOUT_HEADER, [[field if field is not None else "" for field in row[:8]] + [str(row[8])] for row in cursor]
+
+    def write_workouts(self, rows):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM workouts")
+            self.insert_workouts(rows)
+
+    def insert_workouts(self, rows):
+        self.connection.executemany("INSERT INTO workouts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (self.workout_params(row) for row in rows))
+
+    def append_workouts(self, rows):
+        with self.lock, self.connection:
+            self.insert_workouts(rows)
+
+    def update_workout(self, row, records):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO workouts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.workout_params(row))
+
+    def delete_workouts(self, record_ids, records):
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM workouts WHERE id = ?", ((int(record_id),) for record_id in record_ids))
+
+    def distance_between(self, exercise, start, end):
+        # Meters of exercise with start <= date < end (epoch minutes)
+        with self.lock:
+            return self.connection.execute(
+                "SELECT total(meters) FROM workouts WHERE exercise = ? AND minutes >= ? AND minutes < ?", (exercise, start, end)).fetchone()[0]
+
+    def export_workouts(self, file_path):
+        with open(file_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(WORKOUT_HEADER)
+            writer.writerows(self.read_workouts()[1])
+
+    def read_goals(self):
+        with self.lock:
+            return [list(row) for row in self.connection.execute("SELECT activity, target, period FROM goals ORDER BY position")]
+
+    def write_goals(self, rows):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM goals")
+            self.connection.executemany("INSERT INTO goals (activity, target, period) VALUES (?, ?, ?)", rows)
+
+    def append_goal(self, row):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO goals (activity, target, period) VALUES (?, ?, ?)", row)
+
+    def read_plans(self):
+        with self.lock:
+            return [list(row) for row in self.connection.execute("SELECT day, activity, distance, done FROM plans ORDER BY position")]
+
+    def write_plans(self, rows):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM plans")
+            self.connection.executemany("INSERT INTO plans (day, activity, distance, done) VALUES (?, ?, ?, ?)", rows)
+
+    def append_plan(self, row):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO plans (day, activity, distance, done) VALUES (?, ?, ?, ?)", row)
+
+    def read_profile(self):
+        with self.lock:
+            row = self.connection.execute("SELECT name, age, weight, height FROM profile").fetchone()
+        return list(row) if row else [""] * len(PROFILE_HEADER)
+
+    def write_profile(self, values):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM profile")
+            self.connection.execute("INSERT INTO profile VALUES (?, ?, ?, ?)", values)
+
+def open_backend(directory=".", read_only=False):
+    if os.path.exists(os.path.join(directory, "workouts.db")):
+        return SqliteBackend(directory, read_only)
+    return CsvBackend(directory)
+
+def migrate_to_sqlite(directory=".", batch_size=10000):
+    # One-shot streaming copy of the CSV files into workouts.db; the CSVs are left untouched
+    # apart from folding a pending change journal into workouts.csv
+    source = CsvBackend(directory)
+    if source.journal_size():
+        source.write_workouts(source.read_workouts()[1])
+    target = SqliteBackend(directory)
+    with target.connection:
+        for table in ["workouts", "goals", "plans", "profile"]:
+            target.connection.execute(f"DELETE FROM {table}")
+        try:
+            with open(source.workouts_path, "r", newline="") as file:
+                reader = csv.reader(file)
+                header = next(reader, WORKOUT_HEADER)
+                legacy = header != WORKOUT_HEADER
+                seen_ids = set()
+                pending = []
+                unnumbered = []
+                for row in reader:
+                    if len(row) not in WORKOUT_WIDTHS:
+                        continue
+                    if len(row) == len(LEGACY_WORKOUT_HEADER):
+                        if not legacy:
+                            unnumbered.append(row)
+                            continue
+                        row.append(str(len(seen_ids) + 1))
+                    if row[8].isdigit() and row[8] not in seen_ids:
+                        seen_ids.add(row[8])
+                        pending.append(row)
+                    else:
+                        unnumbered.append(row[:8])
+                    if len(pending) >= batch_size:
+                        target.insert_workouts(pending)
+                        pending = []
+                target.insert_workouts(pending)
+                next_id = max(map(int, seen_ids), default=0) + 1
+                target.insert_workouts(row + [str(next_id + i)] for i, row in enumerate(unnumbered))
+        except FileNotFoundError:
+            pass
+        target.connection.executemany("INSERT INTO goals (activity, target, period) VALUES (?, ?, ?)", (row for row in source.read_goals() if len(row) == 3))
+        target.connection.executemany("INSERT INTO plans (day, activity, distance, done) VALUES (?, ?, ?, ?)", (row for row in source.read_plans() if len(row) == 4))
+        profile = source.read_profile()
+        if len(profile) == len(PROFILE_HEADER):
+            target.connection.execute("INSERT INTO profile VALUES (?, ?, ?, ?)", profile)
+    return target
+
+class WorkoutStore:
+    # Parsed copy of the workouts shared by all views. The backend is only re-read when its
+    # signature changes, e.g. after a restore or an edit made outside the app.
+    # Every row carries a persistent integer id (last column) and self.records maps
+    # id -> row in file order (a compact WorkoutRecords), so edits and deletes only touch the selected ids.
+    # A read_only store never writes to the data directory: no id repairs and no cache files.
+    def __init__(self, backend, read_only=False):
+        self.backend = backend
+        self.read_only = read_only
+        self.records = WorkoutRecords()
+        self.next_id = 1
+        self.signature = None
+        self.version = 0
+        self._columns = None
+        self._rollups = None
+        self._rollups_version = None
+        self._goal_index = None
+        self._pyramid = None
+        self._streaks = None
+        self._streaks_version = None
+        self._queries = OrderedDict()
+        self.compactor = None
+        self.rollups_unsaved = False
+        self.position = None  # Where workouts.csv was last read or written up to, for following appends
+        self.snapshot = None
+        if backend.supports_snapshot:
+            self.snapshot = WorkoutSnapshot(os.path.join(backend.directory, "workouts_snapshot.bin"), [backend.workouts_path, backend.journal_path])
+        self.lock = threading.RLock()  # Views load and aggregate from worker threads
+
+    def load(self):
+        with self.lock:
+            signature = self.backend.signature()
+            if signature is None:
+                self.records = WorkoutRecords()
+                self.signature = None
+                self.position = None
+                raise FileNotFoundError(self.backend.workouts_path)
+            if signature != self.signature and not self.follow(signature):
+                with SPANS.span("store", "read"):
+                    header, rows = self.backend.read_workouts()
+                ids = [row[8] if len(row) == 9 and is_record_id(row[8]) else "" for row in rows]
+                self.next_id = max((int(record_id) for record_id in ids if record_id), default=0) + 1
+                record_ids, seen = [], set()
+                for record_id in ids:
+                    # Rows from before record ids (or with hand-edited duplicates) get fresh ids
+                    if not record_id or record_id in seen:
+                        record_id = self.new_id()
+                    record_ids.append(record_id)
+                    seen.add(record_id)
+                self.records = WorkoutRecords(rows, record_ids)
+                del rows, seen
+                if not self.read_only and (header != WORKOUT_HEADER or len(self.records) != len(set(ids)) or "" in ids):
+                    self.backend.write_workouts(self.records.values())
+                self.signature = self.backend.signature()
+                if self.backend.supports_tail:
+                    self.position = self.backend.position()
+                self.version += 1
+                if self.signature == signature:
+                    self.rekey(("snapshot", signature), self.version)
+            return self.records.values()
+
+    def follow(self, signature):
+        # Takes in rows another program appended to workouts.csv by parsing only the new bytes.
+        # Returns False when the change was anything else (or the rows need fresh ids), so load re-reads everything.
+        if self.position is None or self.signature is None or signature[2:] != self.signature[2:] or signature[0] <= self.signature[0]:
+            return False
+        with SPANS.span("store", "tail"):
+            appended = self.backend.read_appended(self.position)
+        if appended is None:
+            return False
+        rows, position = appended
+        ids = [row[8] if len(row) == len(WORKOUT_HEADER) else "" for row in rows]
+        if not all(is_record_id(record_id) and record_id not in self.records for record_id in ids) or len(set(ids)) != len(ids):
+            return False
+        self.records.extend(rows, ids)
+        self.next_id = max([self.next_id] + [int(record_id) + 1 for record_id in ids])
+        self.saved(added=rows)
+        self.position = position
+        return True
+
+    def changed(self):
+        # Cheap check for a watcher: were the stored workouts changed by someone else since this
+        # store last read or wrote them? Never waits for a busy store; the next poll retries.
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            known = self.signature if self.signature is not None else (self.snapshot.verified if self.snapshot is not None else None)
+            return known is not None and self.backend.signature() != known
+        finally:
+            self.lock.release()
+
+    def data_version(self):
+        # Version the derived data (columns, rollups, ...) is cached under. Until something needs
+        # the records, a valid snapshot stands in for them so column-only views skip the CSV parse.
+        with self.lock:
+            if self.signature is None and self.snapshot is not None:
+                signature = self.backend.signature()
+                if self.snapshot.matches(signature):
+                    return ("snapshot", signature)
+            self.load()
+            return self.version
+
+    def rekey(self, old, new):
+        # The records were just read from the file the snapshot describes, so caches built from it stay valid
+        if self._columns is not None and self._columns[0] == old:
+            self._columns = (new, self._columns[1])
+        if self._goal_index is not None and self._goal_index[0] == old:
+            self._goal_index = (new, self._goal_index[1])
+        if self._pyramid is not None and self._pyramid[0] == old:
+            self._pyramid = (new, self._pyramid[1])
+        if self._rollups_version == old:
+            self._rollups_version = new
+        if self._streaks_version == old:
+            self._streaks_version = new
+        for key, (version, result) in self._queries.items():
+            if version == old:
+                self._queries[key] = (new, result)
+
+    def columns(self):
+        with self.lock:
+            version = self.data_version()
+            if self._columns is None or self._columns[0] != version:
+                with SPANS.span("store", "snapshot"):
+                    columns = self.snapshot.load(self.backend.signature()) if self.snapshot is not None else None
+                if columns is None:
+                    self.load()
+                    version = self.version
+                    with SPANS.span("store", "parse"):
+                        columns = self.records.columns()
+                    if self.snapshot is not None and not self.read_only:
+                        self.snapshot.save(columns, self.signature)
+                self._columns = (version, columns)
+            return self._columns[1]
+
+    def rollups(self):
+        with self.lock:
+            version = self.data_version()
+            if self._rollups is None:
+                self._rollups = WorkoutRollups(os.path.join(self.backend.directory, "workouts_rollups.csv"))
+            if self._rollups_version != version:
+                fingerprint = self.backend.fingerprint()
+                if not self._rollups.load(fingerprint):
+                    columns = self.columns()
+                    with SPANS.span("store", "rollups"):
+                        self._rollups.rebuild(columns)
+                    if not self.read_only:
+                        self._rollups.save(fingerprint)
+                self._rollups_version = version
+            return self._rollups
+
+    def streaks(self):
+        with self.lock:
+            version = self.data_version()
+            if self._streaks is None or self._streaks_version != version:
+                self._streaks = StreakTracker()
+                self._streaks.rebuild(self.columns())
+                self._streaks_version = version
+            return self._streaks
+
+    def goal_index(self):
+        with self.lock:
+            version = self.data_version()
+            if self._goal_index is None or self._goal_index[0] != version:
+                self._goal_index = (version, GoalIndex(self.columns()))
+            return self._goal_index[1]
+
+    def distance_between(self, exercise, start, end):
+        # Meters of exercise with start <= date < end (epoch minutes); an index range scan with
+        # SQLite, two binary searches in the goal index otherwise
+        if self.backend.supports_range_queries:
+            return self.backend.distance_between(exercise, start, end)
+        return self.goal_index().total(exercise, start, end)
+
+    def cached(self, key, compute):
+        # LRU of view query results (key is the view plus its filter/metric/range). An entry is only
+        # used while the data version it was computed under is current, so any write invalidates it.
+        with self.lock:
+            version = self.data_version()
+            entry = self._queries.get(key)
+            if entry is not None and entry[0] == version:
+                self._queries.move_to_end(key)
+                return entry[1]
+        result = compute()
+        with self.lock:
+            self._queries[key] = (version, result)
+            self._queries.move_to_end(key)
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return result
+
+    def pyramid(self):
+        with self.lock:
+            version = self.data_version()
+            if self._pyramid is None or self._pyramid[0] != version:
+                rollups = self.rollups()
+                with SPANS.span("store", "pyramid"):
+                    self._pyramid = (version, GraphPyramid(rollups))
+            return self._pyramid[1]
+
+    def new_id(self):
+        record_id = str(self.next_id)
+        self.next_id += 1
+        return record_id
+
+    def get(self, record_id):
+        with self.lock:
+            self.load()
+            return self.records[record_id]
+
+    def get_many(self, record_ids, blocking=True):
+        # Rows of the given ids as currently loaded, None for ids that are gone; never reloads.
+        # With blocking=False, returns None instead of waiting while a worker holds the store.
+        if not self.lock.acquire(blocking):
+            return None
+        try:
+            return [self.records.get(record_id) for record_id in record_ids]
+        finally:
+            self.lock.release()
+
+    def append(self, row):
+        return self.append_many([row])[0]
+
+    def append_many(self, rows):
+        with self.lock:
+            self.load()
+            rows = [[str(field) for field in row[:8]] + [self.new_id()] for row in rows]
+            self.backend.append_workouts(rows)
+            self.records.extend(rows, [row[8] for row in rows])
+            self.saved(added=rows)
+            return [row[8] for row in rows]
+
+    def update(self, record_id, row):
+        with self.lock:
+            self.load()
+            # KeyError when the record was deleted meanwhile; writing it anyway would bring it back
+            old_row = self.records[record_id]
+            row = [str(field) for field in row[:8]] + [record_id]
+            self.records[record_id] = row
+            self.backend.update_workout(row, self.records)
+            self.saved(added=[row], removed=[old_row])
+            self.compact_later()
+
+    def delete(self, record_ids):
+        with self.lock:
+            self.load()
+            removed = [self.records.pop(record_id) for record_id in record_ids if record_id in self.records]
+            self.backend.delete_workouts(record_ids, self.records)
+            self.saved(removed=removed)
+            self.compact_later()
+
+    def replace_all(self, rows):
+        with self.lock:
+            self.next_id = 1
+            rows = [[str(field) for field in row[:8]] + [self.new_id()] for row in rows]
+            self.records = WorkoutRecords(rows, [row[8] for row in rows])
+            self.backend.write_workouts(self.records.values())
+            self.saved()
+
+    def compact_later(self):
+        # Starts a background compaction once the journal is big enough to slow down loading
+        if not self.backend.supports_journal or (self.compactor is not None and self.compactor.is_alive()):
+            return
+        signature = self.signature
+        if signature is None or len(signature) < 4 or signature[2] < max(JOURNAL_COMPACT_BYTES, signature[0] * JOURNAL_COMPACT_SHARE):
+            return
+        self.compactor = threading.Thread(target=self.compact, name="workout-compact", daemon=True)
+        self.compactor.start()
+
+    def compact(self):
+        # Folds the journal into a new workouts.csv. The rows are copied under the lock but written
+        # without it; the new file is only installed if nothing was appended to workouts.csv meanwhile.
+        try:
+            with self.lock:
+                self.load()
+                records = self.records.copy()
+                base = self.signature[:2]
+                journal_offset = self.backend.journal_size()
+            with SPANS.span("store", "compact"):
+                temp_path = self.backend.write_base(records.values())
+        except OSError:
+            return False  # workouts.csv is untouched and the journal is retried after the next write
+        with self.lock:
+            signature = self.backend.signature()
+            try:
+                if signature is None or signature[:2] != base:
+                    raise OSError("workouts.csv changed during compaction")
+                self.backend.install_base(temp_path, journal_offset)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return False
+            if self.signature != signature:
+                return True  # Also changed outside the store, so the next load re-reads it anyway
+            self.signature = self.backend.signature()
+            self.position = self.backend.position()
+            # Same data under a new signature: move the persisted caches over to it
+            self.rollups_unsaved = True
+            self.flush()
+            if self.snapshot is not None and self._columns is not None and self._columns[0] == self.version:
+                self.snapshot.save(self._columns[1], self.signature)
+            return True
+
+    def saved(self, added=(), removed=()):
+        rollups_current = self._rollups is not None and self._rollups_version == self.version
+        streaks_current = self._streaks is not None and self._streaks_version == self.version
+        self.signature = self.backend.signature()
+        if self.backend.supports_tail:
+            self.position = self.backend.position()
+        self.version += 1
+        if streaks_current:
+            for row in removed:
+                self._streaks.remove(row)
+            for row in added:
+                self._streaks.add(row)
+            self._streaks_version = self.version
+        if rollups_current:
+            for row in removed:
+                self._rollups.remove(row)
+            for row in added:
+                self._rollups.add(row)
+            self._rollups_version = self.version
+            self.rollups_unsaved = True
+
+    def flush(self):
+        # Incrementally updated rollups are written back here rather than on every write, which
+        # would cost a pass over all buckets; unsaved ones are simply rebuilt on the next start
+        with self.lock:
+            if self.rollups_unsaved and self._rollups is not None and self._rollups_version == self.version:
+                fingerprint = self.backend.fingerprint()
+                if fingerprint is not None:
+                    self._rollups.save(fingerprint)
+            self.rollups_unsaved = False
+
+class WorkoutImporter:
+    # Streams a CSV export into the store in chunks: every row is validated and normalized,
+    # rows already in the store (or earlier in the file) are skipped via a hash index whose hits
+    # are confirmed by comparing against the stored row, and each chunk is written with a single
+    # append. Only hashes and record ids are kept, so memory doesn't grow with the rows imported.
+    # progress(fraction, imported) is called per chunk.
+    EXERCISES = {"run": "Run", "swim": "Swim", "walk": "Walk"}
+    MAX_EXAMPLES = 10
+
+    def __init__(self, store, chunk_size=5000, progress=None):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.keys = None  # Row hash -> record id (the row itself until it is written), a list when rows share a hash
+
+    @classmethod
+    def normalize(cls, row):
+        # Canonical 8-field row; raises ValueError with the reason the row is rejected
+        if len(row) not in WORKOUT_WIDTHS:
+            raise ValueError("wrong number of columns")
+        row = [field.strip() for field in row[:8]]
+        # Quotes around the parsed fields are leftovers of old exports; notes keep theirs
+        for i in (0, 1, 5, 6):
+            row[i] = row[i].strip('"').strip()
+        try:
+            minutes = parse_timestamp(row[0])
+        except ValueError:
+            raise ValueError("invalid date")
+        row[0] = (EPOCH + timedelta(minutes=minutes)).strftime("%d.%m.%Y %H:%M")
+        if not row[1]:
+            raise ValueError("missing exercise")
+        row[1] = cls.EXERCISES.get(row[1].lower(), row[1])
+        if row[5]:
+            try:
+                distance = float(row[5])
+            except ValueError:
+                raise ValueError("invalid distance")
+            if not np.isfinite(distance) or distance < 0:
+                raise ValueError("invalid distance")
+        if row[6]:
+            try:
+                pace = parse_pace_seconds(row[6])
+            except ValueError:
+                raise ValueError("invalid pace")
+            if pace < 0:
+                raise ValueError("invalid pace")
+            row[6] = f"{pace // 60:02d}:{pace % 60:02d}"
+        return row
+
+    @classmethod
+    def key(cls, row):
+        return hash(tuple(row[:8]))
+
+    def existing_keys(self):
+        # Hashes every stored workout. Only the ids are copied; the rows are fetched a chunk at a
+        # time, so the store stays usable while they are hashed.
+        with self.store.lock:
+            self.store.load()
+            record_ids = array("q", map(int, self.store.records))
+        self.keys = {}
+        for start in range(0, len(record_ids), self.chunk_size):
+            chunk = record_ids[start:start + self.chunk_size]
+            for record_id, row in zip(chunk, self.store.get_many([str(record_id) for record_id in chunk])):
+                if row is not None:
+                    self.remember(self.existing_row(row), record_id)
+
+    def existing_row(self, row):
+        try:
+            return tuple(self.normalize(row))
+        except ValueError:
+            return tuple(row[:8])
+
+    def matches(self, ref, row):
+        if isinstance(ref, tuple):
+            return ref == row
+        stored = self.store.get_many([str(ref)])[0]
+        return stored is not None and self.existing_row(stored) == row
+
+    def remember(self, row, ref):
+        # Records ref (a record id, or the row while it is not written yet) under the hash of row
+        # unless an equal row is known already. True if new.
+        key = self.key(row)
+        refs = self.keys.get(key)
+        if refs is None:
+            self.keys[key] = ref
+            return True
+        if not isinstance(refs, list):
+            refs = [refs]
+        if any(self.matches(other, row) for other in refs):
+            return False
+        self.keys[key] = refs + [ref]
+        return True
+
+    def settle(self, row, record_id):
+        # Swaps a row that was just written for its record id
+        key = self.key(row)
+        refs = self.keys[key]
+        if isinstance(refs, list):
+            self.keys[key] = [record_id if other == row else other for other in refs]
+        else:
+            self.keys[key] = record_id
+
+    def run(self, file_path):
+        summary = {"imported": 0, "duplicates": 0, "rejected": {}, "examples": []}
+        self.existing_keys()
+        total_size = max(os.path.getsize(file_path), 1)
+        consumed = [0]
+
+        def lines(source):
+            for line in source:
+                consumed[0] += len(line)
+                yield line
+
+        with open(file_path, "r", newline="") as source:
+            reader = csv.reader(lines(source))
+            next(reader, None)
+            chunk = []
+            for row in reader:
+                if not any(field.strip() for field in row):
+                    continue  # Blank lines are neither imported nor rejected
+                try:
+                    row = self.normalize(row)
+                except ValueError as e:
+                    reason = str(e)
+                    summary["rejected"][reason] = summary["rejected"].get(reason, 0) + 1
+                    if len(summary["examples"]) < self.MAX_EXAMPLES:
+                        summary["examples"].append((reader.line_num, reason))
+                    continue
+                if not self.remember(tuple(row), tuple(row)):
+                    summary["duplicates"] += 1
+                    continue
+                chunk.append(row)
+                if len(chunk) >= self.chunk_size:
+                    self.flush(chunk, summary, consumed[0] / total_size)
+                    chunk = []
+            self.flush(chunk, summary, 1.0)
+        self.keys = None
+        return summary
+
+    def flush(self, chunk, summary, fraction):
+        if chunk:
+            for row, record_id in zip(chunk, self.store.append_many(chunk)):
+                self.settle(tuple(row), int(record_id))
+            summary["imported"] += len(chunk)
+        if self.progress is not None:
+            self.progress(min(fraction, 1.0), summary["imported"])
+
+def format_pace(pace_float, unit):
+    minutes = int(pace_float)
+    seconds = int((pace_float - minutes) * 60)
+    return f"{minutes}:{seconds:02d} {unit}"
+
+@SPANS.traced("stats", "aggregate")
+def stats_report(store, now=None):
+    # (stats text, distance this month in km or None without data)
+    try:
+        columns = store.columns()
+        if not len(columns.id):
+            return "No workout data available", None
+
+        now = now or datetime.now()
+        # Rows count towards stats only when both distance and pace are present
+        complete = ~np.isnan(columns.distance) & (columns.pace >= 0) & (columns.date >= 0)
+        stats = {}
+        for activity in ["Run", "Swim", "Walk"]:
+            mask = complete & columns.activity_mask(activity)
+            distances = columns.distance[mask] / 1000
+            paces = columns.pace[mask] / 60.0
+            stats[activity] = {
+                "distance": float(distances.sum()),
+                "pace": paces,
+                "max_distance": float(distances.max()) if len(distances) else 0.0,
+                "min_pace": float(paces.min()) if len(paces) else float('inf')
+            }
+        month_start, month_end = WorkoutColumns.month_days(columns.to_month(now))
+        monthly_distance = sum(store.distance_between(activity, month_start * 1440, (month_end + 1) * 1440) for activity in stats) / 1000
+
+        # Advanced Stats: Streaks of distinct workout days
+        streaks = store.streaks()
+        today = (now - EPOCH).days
+
+        text = ""
+        for activity in stats:
+            total_dist = stats[activity]["distance"]
+            pace_list = stats[activity]["pace"]
+            avg_pace = float(pace_list.mean()) if len(pace_list) else 0.0
+            max_dist = stats[activity]["max_distance"]
+            min_pace = stats[activity]["min_pace"] if stats[activity]["min_pace"] != float('inf') else 0.0
+            unit_dist = "km" if activity in ["Run", "Walk"] else "m"
+            unit_pace = "min/km" if activity in ["Run", "Walk"] else "min/100m"
+            avg_pace_str = format_pace(avg_pace, unit_pace)
+            min_pace_str = format_pace(min_pace, unit_pace) if min_pace > 0 else "N/A"
+            text += f"{activity}:\n"
+            text += f"Total Distance: {total_dist:.2f} {unit_dist}\n"
+            text += f"Average Pace: {avg_pace_str}\n"
+            text += f"Fastest Pace: {min_pace_str}\n"
+            text += f"Longest {activity}: {max_dist:.2f} {unit_dist}\n"
+            text += f"{activity} Streak: {streaks.current(today, activity)} days (longest {streaks.longest(activity)})\n\n"
+
+        text += f"Longest Workout Streak: {streaks.longest()} days\n"
+        text += f"Current Workout Streak: {streaks.current(today)} days\n"
+        return text, monthly_distance
+
+    except FileNotFoundError:
+        return "No data available", None
+
+@SPANS.traced("goals", "aggregate")
+def goal_rows(store, now=None):
+    # (goal position, display row) for each goal
+    current_time = now or datetime.now()
+    display_rows = []
+    try:
+        for i, goal in enumerate(store.backend.read_goals()):
+            if len(goal) != 3:
+                continue
+            activity, period = goal[0], goal[2]
+            unit = "km" if activity in ["Run", "Walk"] else "m"
+            try:
+                # Hand-edited goals with a bad target or period are skipped like unknown ones
+                target = float(goal[1])
+                progress = store.distance_between(activity, *goal_range(period, current_time)) / 1000
+            except ValueError:
+                continue
+            display_rows.append((i, (activity, f"{target:.2f} {unit}", period, f"{progress:.2f}/{target:.2f} {unit}")))
+    except FileNotFoundError:
+        return []
+    return display_rows
+
+@SPANS.traced("achievements", "aggregate")
+def achievements_report(store):
+    achievements = {
+        "First 10 km Run": {"type": "Run", "distance": 10, "earned": False},
+        "50 Workouts": {"count": 50, "earned": False},
+        "Fast Swimmer": {"type": "Swim", "pace": 1.5, "earned": False}  # Pace <= 1:30 min/100m
+    }
+
+    try:
+        columns = store.columns()
+
+        if np.any(columns.activity_mask("Run") & (columns.distance >= 10000)):
+            achievements["First 10 km Run"]["earned"] = True
+        if np.any(columns.activity_mask("Swim") & (columns.pace >= 0) & (columns.pace <= 90)):
+            achievements["Fast Swimmer"]["earned"] = True
+        if len(columns.id) >= 50:
+            achievements["50 Workouts"]["earned"] = True
+
+        text = ""
+        for name, details in achievements.items():
+            status = "Earned" if details["earned"] else "Not Earned"
+            text += f"{name}: {status}\n"
+        return text
+
+    except FileNotFoundError:
+        return "No workout data to calculate achievements"
+
+def bucket_key(granularity, day):
+    # Bucket of an epoch day at a graph granularity (weeks start on Monday, like the rollups)
+    if granularity == "Day":
+        return day
+    if granularity == "Week":
+        return (day + 3) // 7
+    date = EPOCH + timedelta(days=day)
+    month = WorkoutColumns.to_month(date)
+    return month if granularity == "Month" else month // 12
+
+def bucket_days(granularity, key):
+    # First and last epoch day of a bucket
+    if granularity == "Day":
+        return key, key
+    if granularity == "Week":
+        return key * 7 - 3, key * 7 + 3
+    if granularity == "Month":
+        return WorkoutColumns.month_days(key)
+    return WorkoutColumns.month_days(key * 12)[0], WorkoutColumns.month_days(key * 12 + 11)[1]
+
+def bucket_starts(granularity, keys):
+    # First epoch day of each bucket in an array of bucket keys
+    if granularity == "Day":
+        return keys
+    if granularity == "Week":
+        return keys * 7 - 3
+    months = keys if granularity == "Month" else keys * 12
+    return months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+def bucket_label(granularity, day):
+    date = EPOCH + timedelta(days=int(day))
+    return date.strftime({"Day": "%d.%m.%Y", "Week": "week of %d.%m.%Y", "Month": "%b %Y", "Year": "%Y"}[granularity])
+
+def downsample(x, y, max_points):
+    # Min/max decimation: the points are split into max_points // 2 runs of neighbours and only the
+    # lowest and highest point of each run are kept, so peaks survive at one point per pixel column
+    if max_points is None or len(x) <= max_points:
+        return x, y
+    runs = max(max_points // 2, 1)
+    width = -(-len(y) // runs)
+    padded = np.full(runs * width, np.nan)
+    padded[:len(y)] = y
+    padded = padded.reshape(runs, width)
+    offsets = np.arange(runs) * width
+    lowest = offsets + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    highest = offsets + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    keep = np.unique(np.concatenate((lowest, highest)))
+    keep = keep[keep < len(y)]
+    return x[keep], y[keep]
+
+@SPANS.traced("graph", "aggregate")
+def graph_series(store, activity_filter, metric, start_date, end_date, granularity="Month", max_points=None):
+    # Series to plot, or None without data. Each series is (x, y) with x the first epoch day of
+    # each bucket, which is also a matplotlib date number; max_points caps the points per series.
+    try:
+        return store.cached(("graph", activity_filter, metric, start_date, end_date, granularity, max_points),
+                            lambda: graph_window(store.pyramid(), activity_filter, metric, (start_date - EPOCH).days, (end_date - EPOCH).days, granularity, max_points))
+    except FileNotFoundError:
+        return None
+
+def series_values(metric, totals):
+    # Plotted value of each [meters, distance count, pace seconds, pace count] bucket
+    if metric == "Pace":
+        # Buckets without a pace are gaps in the line rather than zeros
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(totals[:, 3] > 0, totals[:, 2] / totals[:, 3] / 60.0, np.nan)
+    return totals[:, 0] / 1000
+
+def graph_unit(activity_filter, metric):
+    return {"Distance": "km", "Pace": "min/km" if activity_filter in ["Run", "Walk", "All"] else "min/100m"}[metric]
+
+class GraphPyramid:
+    # The rollups of each graphed activity as sorted numpy arrays at day, week, month and year
+    # level. A zoom or pan picks the level that fits the visible range and only slices out the
+    # buckets in view, so its cost depends on the canvas width rather than on the data size.
+    EMPTY = (np.empty(0, dtype=np.int64), np.empty((0, 4)))
+
+    def __init__(self, rollups):
+        self.levels = {}
+        for act in GRAPH_COLORS:
+            for granularity, level in (("Day", "day"), ("Week", "week"), ("Month", "month")):
+                buckets = rollups.level(act, level)
+                keys = np.array(sorted(buckets), dtype=np.int64)
+                totals = np.array([buckets[key] for key in keys.tolist()], dtype=np.float64).reshape(-1, 4)
+                self.levels[(act, granularity)] = (keys, totals)
+            keys, totals = self.levels[(act, "Month")]
+            years, inverse = np.unique(keys // 12, return_inverse=True)
+            year_totals = np.zeros((len(years), 4))
+            np.add.at(year_totals, inverse, totals)
+            self.levels[(act, "Year")] = (years, year_totals)
+
+    @staticmethod
+    def pick(first_day, last_day, max_buckets):
+        # Finest level with at most max_buckets buckets in view
+        for granularity in GRAPH_GRANULARITIES:
+            if bucket_key(granularity, last_day) - bucket_key(granularity, first_day) + 1 <= max_buckets:
+                return granularity
+        return GRAPH_GRANULARITIES[-1]
+
+    def days_total(self, activity, first_day, last_day):
+        keys, totals = self.levels.get((activity, "Day"), self.EMPTY)
+        low, high = np.searchsorted(keys, (first_day, last_day + 1))
+        return totals[low:high].sum(axis=0)
+
+    def window(self, activity, granularity, first_day, last_day):
+        # (first day of each bucket, bucket totals) for every bucket overlapping first_day..last_day,
+        # with empty buckets filled in as zeros. Buckets inside the range come from their level;
+        # the two at the ends only count their days inside the range, summed from the day level.
+        keys, totals = self.levels.get((activity, granularity), self.EMPTY)
+        first, last = bucket_key(granularity, first_day), bucket_key(granularity, last_day)
+        low, high = np.searchsorted(keys, (first, last + 1))
+        dense = np.zeros((last - first + 1, 4))
+        dense[keys[low:high] - first] = totals[low:high]
+        if granularity != "Day":
+            dense[0] = self.days_total(activity, first_day, min(bucket_days(granularity, first)[1], last_day))
+            dense[-1] = self.days_total(activity, max(bucket_days(granularity, last)[0], first_day), last_day)
+        return bucket_starts(granularity, np.arange(first, last + 1, dtype=np.int64)), dense
+
+@SPANS.traced("graph", "window")
+def graph_window(pyramid, activity_filter, metric, first_day, last_day, granularity="Auto", max_points=None):
+    # graph_series for the buckets overlapping a visible range of epoch days, served from a
+    # GraphPyramid. "Auto" picks the finest level that leaves each bucket two points of max_points.
+    if granularity == "Auto":
+        granularity = pyramid.pick(first_day, last_day, (max_points or GRAPH_PNG_POINTS) // 2)
+    activities = ["Run", "Swim", "Walk"] if activity_filter == "All" else [activity_filter]
+    series = {}
+    for act in activities:
+        x, totals = pyramid.window(act, granularity, first_day, last_day)
+        series[act] = downsample(x.astype(np.float64), series_values(metric, totals), max_points)
+    return {"metric": metric, "unit": graph_unit(activity_filter, metric), "granularity": granularity, "series": series}
+
+@SPANS.traced("history", "aggregate")
+def history_view(store, filter_type, selection=()):
+    # (columns, filtered row positions, surviving selection, total km) for the History table
+    try:
+        store.load()  # The table shows rows from store.records
+        columns, positions, total_distance_km = store.cached(("history", filter_type), lambda: history_rows(store, filter_type))
+    except FileNotFoundError:
+        return None
+    if selection:
+        selected = np.isin(columns.id[positions], [int(record_id) for record_id in selection])
+        selection = {str(record_id) for record_id in columns.id[positions[selected]]}
+    return columns, positions, selection, total_distance_km
+
+def history_rows(store, filter_type):
+    columns = store.columns()
+    if filter_type == "All":
+        mask = np.ones(len(columns.exercise), dtype=bool)
+    else:
+        codes = [code for code, name in enumerate(columns.exercises) if filter_type.lower() in name.lower()]
+        mask = np.isin(columns.exercise, codes)
+    total_distance_km = float(np.nansum(columns.distance[mask])) / 1000
+    return columns, np.flatnonzero(mask), total_distance_km
+
+def history_display_row(row):
+    exercise = row[1]
+    try:
+        distance = f"{parse_distance(row[5]):.2f}"
+    except ValueError:
+        distance = row[5]
+    dist_unit = "m" if exercise.lower() == "swim" else "km"
+    pace_unit = "min/100m" if exercise.lower() == "swim" else "min/km"
+    return [row[0], exercise, f"{distance} {dist_unit}", f"{row[6]} {pace_unit}", row[7]]
+
+def save_graph_png(graph, file_path):
+    # Headless rendering of a graph_series result, styled like the Graphs view
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=(8, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if graph is None:
+        ax.text(0.5, 0.5, "No data available", ha="center", va="center", transform=ax.transAxes)
+    else:
+        from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+        locator = AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+        for act, (x, values) in graph["series"].items():
+            ax.plot(x, values, color=GRAPH_COLORS.get(act), marker="o" if len(x) <= GRAPH_MARKER_POINTS else None, label=act)
+        ax.set_title(f"{graph['metric']} Over Time ({graph['granularity']})")
+        ax.set_ylabel(f"{graph['metric']} ({graph['unit']})")
+        ax.legend()
+    fig.savefig(file_path, dpi=100, bbox_inches="tight")
+
+def report_names(directories):
+    # Output file prefix for each directory: its name, or its relative path when another directory
+    # has the same name (a/data and b/data become a_data and b_data); repeats get a number
+    names = [os.path.basename(os.path.abspath(directory)) for directory in directories]
+    result = []
+    for directory, name in zip(directories, names):
+        if names.count(name) > 1:
+            path = os.path.relpath(os.path.abspath(directory))
+            if path.startswith(os.pardir):
+                path = os.path.splitdrive(os.path.abspath(directory))[1]
+            name = path.strip(os.sep).replace(os.sep, "_")
+        unique, count = name, 1
+        while unique in result:
+            count += 1
+            unique = f"{name}-{count}"
+        result.append(unique)
+    return result
+
+def report_directory(directory, output_dir, activity_filter, metric, start_date, end_date, granularity="Month", name=None):
+    # Stats, goals and achievements of one data directory as text, plus its graph as a PNG
+    store = WorkoutStore(open_backend(directory, read_only=True), read_only=True)
+    name = name or os.path.basename(os.path.abspath(directory))
+    stats_text, monthly_distance = stats_report(store)
+    lines = [f"== {directory} ==", "", "Stats", stats_text.rstrip()]
+    if monthly_distance is not None:
+        lines.append(f"Distance this month: {monthly_distance:.2f} km")
+    lines += ["", "Goals"]
+    lines += ["  ".join(display_row) for _, display_row in goal_rows(store)] or ["No goals"]
+    lines += ["", "Achievements", achievements_report(store).rstrip()]
+    try:
+        store.data_version()
+        graph = graph_series(store, activity_filter, metric, start_date, end_date, granularity, GRAPH_PNG_POINTS)
+    except FileNotFoundError:
+        graph = None
+    os.makedirs(output_dir, exist_ok=True)
+    graph_path = os.path.join(output_dir, f"{name}_graph.png")
+    save_graph_png(graph, graph_path)
+    lines += ["", f"Graph: {graph_path}"]
+    report = "\n".join(lines) + "\n"
+    with open(os.path.join(output_dir, f"{name}_report.txt"), "w") as file:
+        file.write(report)
+    return report
+
+def report_job(job):
+    # (report, None) or (None, error message) for one report_directory call
+    try:
+        return report_directory(*job), None
+    except (OSError, sqlite3.Error, csv.Error, ValueError) as e:
+        return None, f"{job[0]}: {e}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute workout stats, goals and graphs without the GUI.")
+    parser.add_argument("directories", nargs="+", help="data directories containing workouts.csv or workouts.db")
+    parser.add_argument("--output", default="reports", help="directory for the text reports and graph PNGs")
+    parser.add_argument("--activity", default="All", choices=["All", "Run", "Swim", "Walk"])
+    parser.add_argument("--metric", default="Distance", choices=["Distance", "Pace"])
+    parser.add_argument("--granularity", default="Month", choices=GRAPH_GRANULARITIES, help="size of each graph bucket")
+    parser.add_argument("--from", dest="start", help="first day of the graph, DD.MM.YYYY (default: a year ago)")
+    parser.add_argument("--to", dest="end", help="last day of the graph, DD.MM.YYYY (default: today)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes used across data directories")
+    parser.add_argument("--trace", action="store_true", help="print timing spans and peak memory to stderr")
+    args = parser.parse_args(argv)
+    if args.trace:
+        SPANS.log = True
+        SPANS.enable_memory()
+
+    try:
+        end_date = EPOCH + timedelta(minutes=parse_timestamp(args.end + " 23:59")) if args.end else datetime.now()
+        start_date = EPOCH + timedelta(minutes=parse_timestamp(args.start + " 00:00")) if args.start else end_date - timedelta(days=365)
+    except ValueError:
+        parser.error("Invalid date format (use DD.MM.YYYY)")
+    if start_date > end_date:
+        parser.error("Start date must be before end date")
+
+    status = 0
+    directories = []
+    for directory in args.directories:
+        if os.path.isdir(directory) and os.access(directory, os.R_OK | os.X_OK):
+            directories.append(directory)
+        else:
+            print(f"{directory}: not a readable directory", file=sys.stderr)
+            status = 1
+    jobs = [(directory, args.output, args.activity, args.metric, start_date, end_date, args.granularity, name)
+            for directory, name in zip(directories, report_names(directories))]
+    if len(jobs) <= 1 or args.workers <= 1 or args.trace:
+        results = [report_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as pool:
+            results = pool.map(report_job, jobs)
+    for report, error in results:
+        if error is None:
+            print(report)
+        else:
+            print(error, file=sys.stderr)
+            status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())